@@ -0,0 +1,192 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from app.config import FAST_PATH_ENABLED, FAST_PATH_MIN_CONFIDENCE
+import re
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+GREETING_PATTERN = re.compile(
+    r"^(hi|hello|hey|hiya|yo|good (morning|afternoon|evening))( there)?[\s!.]*$", re.IGNORECASE
+)
+THANKS_PATTERN = re.compile(
+    r"^(thanks|thank you|thx|ty|cheers|great,? thanks|thanks a lot|many thanks)[\s!.]*$", re.IGNORECASE
+)
+ACK_PATTERN = re.compile(r"^(ok|okay|k|cool|great|nice|got it|sounds good|alright)[\s!.]*$", re.IGNORECASE)
+BYE_PATTERN = re.compile(r"^(bye|goodbye|see you|see ya|good night)[\s!.]*$", re.IGNORECASE)
+
+DATE_PHRASE = (
+    r"(?P<when>today|tonight|tomorrow|the day after tomorrow|day after tomorrow"
+    r"|(?:this|next) (?:week|month)"
+    r"|(?:on |this |next )?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday))"
+)
+CALENDAR_NOUN = r"(?:events|meetings|schedule|calendar|plans|agenda)"
+# "what's"/"show"/"list"/"any" only ask about the calendar with a noun ("what's on my calendar today")
+# or as "what's on"; "what is today?" asks for the date. "do I have" is always a calendar question.
+QUERY_PATTERN = re.compile(
+    r"^(?:(?:what(?:'s| is)?|show(?: me)?|list|any)(?: (?:on|for|in))?(?: my)? " + CALENDAR_NOUN +
+    r"|what(?:'s| is) on"
+    r"|(?:what )?(?:do i have|have i got)(?: (?:on|for|in))?(?: my)?(?: " + CALENDAR_NOUN + r")?)"
+    r"(?: (?:on|for))? " + DATE_PHRASE +
+    r"(?: (?:on my calendar|in my calendar))?\s*\??$",
+    re.IGNORECASE,
+)
+
+SMALL_TALK_REPLIES = {
+    "greeting": "Hi there! How can I help with your calendar today?",
+    "thanks": "You're welcome! Let me know if there's anything else on your calendar I can help with.",
+    "ack": "Great! Let me know if you need anything else with your calendar.",
+    "bye": "Goodbye! Feel free to message me whenever you need help with your calendar.",
+}
+
+
+def parse_relative_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    """Resolve simple relative date phrases like "tomorrow" or "next Monday".
+
+    A bare or "this"/"on" weekday is the upcoming occurrence (today included),
+    "next <weekday>" is the next occurrence strictly after today.
+    Returns None if the phrase is not recognized.
+    """
+    today = today or datetime.now().date()
+    phrase = text.strip().lower()
+
+    if phrase in ("today", "tonight"):
+        return today
+    if phrase == "tomorrow":
+        return today + timedelta(days=1)
+    if phrase in ("day after tomorrow", "the day after tomorrow"):
+        return today + timedelta(days=2)
+
+    match = re.fullmatch(r"(?:(on|this|next) )?(\w+)", phrase)
+    if not match or match.group(2) not in WEEKDAYS:
+        return None
+
+    days_ahead = (WEEKDAYS.index(match.group(2)) - today.weekday()) % 7
+    if match.group(1) == "next" and days_ahead == 0:
+        days_ahead = 7
+    return today + timedelta(days=days_ahead)
+
+
+def parse_relative_range(text: str, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    """Resolve "this/next week" (Monday to Sunday) and "this/next month" to a (first, last) day pair.
+
+    Any single-day phrase understood by parse_relative_date is returned as a
+    one-day range. Returns None if the phrase is not recognized.
+    """
+    today = today or datetime.now().date()
+    phrase = text.strip().lower()
+
+    if phrase in ("this week", "next week"):
+        start = today - timedelta(days=today.weekday())
+        if phrase == "next week":
+            start += timedelta(days=7)
+        return start, start + timedelta(days=6)
+    if phrase in ("this month", "next month"):
+        start = today.replace(day=1)
+        if phrase == "next month":
+            start = (start + timedelta(days=32)).replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    day = parse_relative_date(phrase, today)
+    return (day, day) if day else None
+
+
+class FastPathRouter:
+    """Deterministic pre-classifier that answers obvious messages without an LLM call.
+
+    ``route`` returns a result shaped like ``NLPAgent.analyze`` (plus a canned
+    ``reply`` for small talk), or None when the message should fall through to
+    the LLM path.
+    """
+
+    def __init__(self, min_confidence: float = FAST_PATH_MIN_CONFIDENCE, enabled: bool = FAST_PATH_ENABLED):
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.rule_hits = {}
+
+    def route(self, user_message: str, history: Optional[list] = None) -> Optional[dict]:
+        if not self.enabled:
+            return None
+
+        result = self._classify(user_message.strip(), history or [])
+        if result is None or result["confidence"] < self.min_confidence:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.rule_hits[result["rule"]] = self.rule_hits.get(result["rule"], 0) + 1
+        logger.debug("Fast path hit (%s)", result["rule"])
+        return result
+
+    def answers(self, user_message: str) -> bool:
+        """Whether the fast path would answer this message on its own, without counting it."""
+        if not self.enabled:
+            return False
+        result = self._classify(user_message.strip(), [])
+        return result is not None and result["confidence"] >= self.min_confidence
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "rule_hits": dict(self.rule_hits),
+        }
+
+    def _classify(self, text: str, history: list) -> Optional[dict]:
+        for rule, pattern in (
+            ("greeting", GREETING_PATTERN),
+            ("thanks", THANKS_PATTERN),
+            ("ack", ACK_PATTERN),
+            ("bye", BYE_PATTERN),
+        ):
+            if pattern.match(text):
+                confidence = 0.95
+                # "ok" right after a question from the bot is likely a confirmation
+                if rule == "ack" and self._awaiting_answer(history):
+                    confidence = 0.3
+                return {
+                    "relevant": False,
+                    "reason": f"Matched {rule} rule",
+                    "reply": SMALL_TALK_REPLIES[rule],
+                    "confidence": confidence,
+                    "rule": rule,
+                    "source": "fast_path",
+                }
+
+        match = QUERY_PATTERN.match(text)
+        if match:
+            query_range = parse_relative_range(match.group("when"))
+            if query_range:
+                start, end = query_range
+                return {
+                    "relevant": True,
+                    "reason": "Matched date query rule",
+                    "intent": "query",
+                    "event_name": "",
+                    "date": start.strftime("%Y-%m-%d"),
+                    "end_date": end.strftime("%Y-%m-%d") if end != start else None,
+                    "confirmation_needed": False,
+                    "confidence": 0.9,
+                    "rule": "query",
+                    "source": "fast_path",
+                }
+
+        return None
+
+    @staticmethod
+    def _awaiting_answer(history: list) -> bool:
+        for msg in reversed(history):
+            if msg.role == "assistant":
+                return msg.content.rstrip().endswith("?")
+        return False
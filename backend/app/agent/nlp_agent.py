@@ -1,9 +1,12 @@
 from datetime import datetime
-from litellm import acompletion
-from app.utils.helpers import format_conversation_history
-from app.config import LITELLM_MODEL
-from app.prompts.intent_extraction_prompt import INTENT_EXTRACTION_PROMPT
-from app.prompts.relevancy_classifier_prompt import RELEVANCY_CLASSIFIER_PROMPT
+from app.config import NLP_MODE
+from app.prompts.builder import build_messages
+from app.prompts.intent_extraction_prompt import INTENT_EXTRACTION_PROMPT, INTENT_EXTRACTION_INSTRUCTION
+from app.prompts.classify_and_extract_prompt import CLASSIFY_AND_EXTRACT_PROMPT, CLASSIFY_AND_EXTRACT_INSTRUCTION
+from app.prompts.relevancy_classifier_prompt import RELEVANCY_CLASSIFIER_PROMPT, RELEVANCY_CLASSIFIER_INSTRUCTION
+from app.services.ai_service import model_router
+from app.services.llm_cache import llm_cache
+from app.utils.metrics import timed
 import json
 import logging
 
@@ -14,45 +17,44 @@ logger = logging.getLogger(__name__)
 class NLPAgent:
     def __init__(self):
         self.system_prompt = INTENT_EXTRACTION_PROMPT
-        self.model = LITELLM_MODEL
+        self.mode = NLP_MODE
 
         
+    @timed("relevancy")
     async def check_relevancy(self, user_message: str, history: list) -> dict:
         """Check if the user message is relevant to calendar tasks."""
         
         system_prompt = RELEVANCY_CLASSIFIER_PROMPT
 
-        formatted_history = format_conversation_history(history)
-        
-        response = await acompletion(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_prompt.format(conversation_history=formatted_history)},
-                {"role": "user", "content": f"User message: {user_message}"}
-            ],
+        cache_key = llm_cache.make_key(system_prompt, user_message, history, model_router.model_for("relevancy"))
+        cached = llm_cache.get("relevancy", cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        response = await model_router.complete(
+            "relevancy",
+            messages=build_messages(system_prompt, user_message, history,
+                                    instruction=RELEVANCY_CLASSIFIER_INSTRUCTION),
         )
 
         try:
-            relevancy_result = response["choices"][0]["message"]["content"]
-            return json.loads(relevancy_result)
+            relevancy_result = json.loads(response["choices"][0]["message"]["content"])
+            llm_cache.set("relevancy", cache_key, relevancy_result)
+            return relevancy_result
         except Exception as e:
             return {"relevant": False, "reason": "Failed to process response"}
 
 
+    @timed("intent_extraction")
     async def extract_intent(self, user_message, conversation_history):
         """Process user message and extract calendar intent and details"""
         try:
-            formatted_history = format_conversation_history(conversation_history)
             current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-            system_message = self.system_prompt.format(conversation_history=formatted_history, current_date=current_datetime)
-
-            response = await acompletion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
+            response = await model_router.complete(
+                "extraction",
+                messages=build_messages(self.system_prompt, user_message, conversation_history,
+                                        current_datetime, INTENT_EXTRACTION_INSTRUCTION),
                 max_tokens=500,
                 response_format={"type": "json_object"}
             )
@@ -67,3 +69,57 @@ class NLPAgent:
                 "error": str(e),
                 "confirmation_needed": True
             }
+
+
+    @timed("classify_and_extract")
+    async def classify_and_extract(self, user_message, conversation_history):
+        """Check relevancy and extract calendar intent in a single LLM call"""
+        # Only irrelevant outcomes are cached: extracted event fields depend on the current date
+        cache_key = llm_cache.make_key(
+            CLASSIFY_AND_EXTRACT_PROMPT, user_message, conversation_history, model_router.model_for("extraction")
+        )
+        cached = llm_cache.get("classify", cache_key)
+        if cached is not None:
+            return dict(cached)
+
+        current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M")
+
+        # Timeouts and provider errors propagate, so the user gets an apology rather than small talk
+        response = await model_router.complete(
+            "extraction",
+            messages=build_messages(CLASSIFY_AND_EXTRACT_PROMPT, user_message, conversation_history,
+                                    current_datetime, CLASSIFY_AND_EXTRACT_INSTRUCTION),
+            max_tokens=500,
+            response_format={"type": "json_object"}
+        )
+
+        try:
+            result = response['choices'][0]['message']['content']
+            parsed_result = json.loads(result)
+            parsed_result["relevant"] = bool(parsed_result.get("relevant"))
+            parsed_result.setdefault("confirmation_needed", True)
+        except (ValueError, TypeError, AttributeError) as e:
+            # Not a JSON object
+            logger.error(f"Error classifying and extracting intent: {e}")
+            return {"relevant": False, "reason": "Failed to process response"}
+        if not parsed_result["relevant"]:
+            llm_cache.set("classify", cache_key, parsed_result)
+        return parsed_result
+
+    async def analyze(self, user_message, conversation_history):
+        """Return relevancy and, for relevant messages, the extracted event data.
+
+        Uses one combined LLM call in "combined" mode, or the original
+        check_relevancy -> extract_intent sequence in "split" mode.
+        """
+        if self.mode == "combined":
+            return await self.classify_and_extract(user_message, conversation_history)
+
+        relevancy_result = await self.check_relevancy(user_message, conversation_history)
+        if not relevancy_result.get("relevant"):
+            return relevancy_result
+
+        event_data = await self.extract_intent(user_message, conversation_history)
+        event_data["relevant"] = True
+        event_data.setdefault("reason", relevancy_result.get("reason"))
+        return event_data
@@ -1,27 +1,94 @@
 from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
-from app.services.telegram import TelegramBotService, send_telegram_message
-from app.services.ai_service import get_ai_response, get_small_talk_response
-from app.services.google_calendar import GoogleCalendarService
+from fastapi.responses import PlainTextResponse
+from app.services.telegram import send_telegram_message
+from app.services.ai_service import send_ai_response, send_small_talk_response, ttft_stats
+from app.services.google_calendar import AsyncGoogleCalendarService, bulk_update_data
 from app.api.models import TelegramUpdate
 from app.services.conversation import conversation_state
+from app.services.history_compactor import history_compactor
+from app.services.llm_cache import llm_cache
 from app.agent.nlp_agent import NLPAgent
+from app.agent.fast_path import FastPathRouter
+from app.services.update_queue import UpdateDispatcher, QueueFull, is_text
+from app.services.token_refresher import TokenRefresher
+from app.services.telegram_polling import TelegramPoller
+from app.services.events_cache import title_matches, title_tokens
+from app.utils.cache import TTLCache
+from app.utils.responses import (
+    render_auth_prompt,
+    render_batch,
+    render_bulk_confirm,
+    render_bulk_refused,
+    render_created,
+    render_deleted,
+    render_event_list,
+    render_failure,
+    render_not_found,
+    render_updated,
+)
+from app.utils.metrics import registry, stats_gauges, timed
+from app.config import BULK_CONFIRM_TTL, CONVERSATION_MAX_MESSAGES
 
 import logging
+import re
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 router = APIRouter()
-telegram_service = TelegramBotService()
-calendar_service = GoogleCalendarService()
+calendar_service = AsyncGoogleCalendarService()
 nlp_agent = NLPAgent()
+fast_path_router = FastPathRouter()
 
 access_token = None
 
+# Bulk updates and deletes waiting for the user's go-ahead: chat_id -> (intent, events, per-event event_data)
+pending_bulk_changes = TTLCache(ttl=BULK_CONFIRM_TTL)
+CONFIRM_PATTERN = re.compile(r"^(yes|y|yep|yeah|sure|ok|okay|confirm|do it|go ahead)[\s!.]*$", re.IGNORECASE)
+
 
 @router.post("/webhook")
 async def telegram_webhook(update: TelegramUpdate):
-    """Handle incoming Telegram messages"""
+    """Acknowledge a Telegram update right away and queue it for the workers"""
+    try:
+        await update_dispatcher.submit(update)
+    except QueueFull:
+        # A non-2xx status makes Telegram redeliver the update later
+        raise HTTPException(status_code=503, detail="Too many pending updates")
+    return {"status": "ok"}
+
+
+def pick_target(events: list, event_name: str = None):
+    """The event an update or delete refers to, or None when it is not certain which one.
+
+    With a name, the event's title must contain all of its words, even when
+    only one event was found; without one, only a single event qualifies.
+    """
+    wanted = title_tokens(event_name or "")
+    if not wanted:
+        return events[0] if len(events) == 1 else None
+    matches = [event for event in events if wanted <= title_tokens(event["summary"])]
+    return matches[0] if len(matches) == 1 else None
+
+
+async def run_batch(chat_id: int, intent: str, events: list, changes: list) -> str:
+    """Apply the update or delete to every event in one batch request; returns the rendered outcome."""
+    results = await calendar_service.batch_mutate(chat_id, [
+        {
+            "action": intent,
+            "event_id": event["id"],
+            "calendar_id": event["calendar_id"],
+            "event_data": change,
+        }
+        for event, change in zip(events, changes)
+    ])
+    done = sum(result["success"] for result in results)
+    return render_batch(intent, done, len(events))
+
+
+@timed("update")
+async def process_update(update: TelegramUpdate):
+    """Handle an incoming Telegram message"""
     
     # logger.info(f"------------------------------------>Received update: {update}")
     if not update.message:
@@ -43,128 +110,147 @@ async def telegram_webhook(update: TelegramUpdate):
         return {"status": "ok"}
     
     
-    auth_check = calendar_service.is_authenticated()
-    test = calendar_service.list_calendars()
-    # logger.info(f"------------------------------------>Test: {test}")
-
+    auth_check = await calendar_service.is_authenticated(chat_id)
     
     if auth_check is not True:
-        url_auth = calendar_service.get_auth_url()
-        await send_telegram_message(
-            chat_id,
-            f"To use this bot, please authenticate your Google account: [Click here]({url_auth})"
-        )
+        url_auth = await calendar_service.get_auth_url(chat_id)
+        await send_telegram_message(chat_id, render_auth_prompt(url_auth), parse_mode="MarkdownV2")
         return {"status": "ok"}
     
     # Add user message to conversation history
     conversation_state.add_message(chat_id, "user", user_message, message_type)
-    history = conversation_state.get_conversation_history(chat_id)
+    history = history_compactor.compact(
+        chat_id, conversation_state.get_conversation_history(chat_id, CONVERSATION_MAX_MESSAGES)
+    )
     
     # logger.info(f"---------------------Conversation history: {history}")
-    
-    # Check relevancy before extracting intent
-    relevancy_result = await nlp_agent.check_relevancy(user_message, history)
-    # logger.info(f"------------------>RELEVANCY:{relevancy_result}")
-    if not relevancy_result["relevant"]:
-        ai_response = await get_small_talk_response(user_message, history)
-        await send_telegram_message(chat_id, ai_response)
-        conversation_state.add_message(chat_id, "assistant", ai_response)
-        return {"status": "ok"}  
-    
+
+    # A pending bulk change runs only on an explicit yes; any other message drops it
+    pending = pending_bulk_changes.get(chat_id)
+    if pending is not None:
+        pending_bulk_changes.invalidate(chat_id)
+        if CONFIRM_PATTERN.match(user_message.strip()):
+            response = await run_batch(chat_id, *pending)
+            await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
+            conversation_state.add_message(chat_id, "assistant", response)
+            return {"status": "ok"}
     
     try:
-        event_data = await nlp_agent.extract_intent(user_message, history)
+        # Obvious messages are answered by the fast path; everything else goes to the LLM
+        event_data = fast_path_router.route(user_message, history)
+        if event_data is None:
+            # Check relevancy and extract intent (one LLM call in combined mode)
+            event_data = await nlp_agent.analyze(user_message, history)
+        # logger.info(f"------------------>ANALYSIS:{event_data}")
+        if not event_data["relevant"]:
+            if event_data.get("reply"):
+                ai_response = event_data["reply"]
+                await send_telegram_message(chat_id, ai_response)
+            else:
+                ai_response = await send_small_talk_response(chat_id, user_message, history)
+            conversation_state.add_message(chat_id, "assistant", ai_response)
+            return {"status": "ok"}
+
         # logger.info(f"===========> Event data: {event_data}")
 
-        # If no confirmation is needed, proceed with the action
+        # If no confirmation is needed, proceed with the action; outcomes are rendered without the LLM
         if event_data["confirmation_needed"] is False:
             if event_data["intent"] == "create":
                 # Create event in Google Calendar
-                calendar_response = calendar_service.create_event(event_data)
+                calendar_response = await calendar_service.create_event(chat_id, event_data)
                 if calendar_response["success"]:
-                    await send_telegram_message(
-                        chat_id, f"Event created successfully! Here's the link to your event: {calendar_response['event_link']}"
-                    )
+                    response = render_created(calendar_response["event"])
+                else:
+                    response = render_failure("create", calendar_response.get("message"))
+                await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
+                conversation_state.add_message(chat_id, "assistant", response)
                 return {"status": "ok"}
 
             elif event_data["intent"] in ["update", "delete"]:
                 # Query events based on event details (using the same query for both update and delete)
-                matched_events = calendar_service.query_events({
+                matched_events = await calendar_service.query_events(chat_id, {
                     "event_name": event_data.get("event_name", ""),
                     "date": event_data.get("date", "")
                 })
 
-                if not matched_events["success"] or not matched_events["events"]:
-                    response = "No matching events found."
-                    await send_telegram_message(chat_id, response)
+                # Only events whose title matches the name may be changed, never everything in the range
+                events = matched_events.get("events") or []
+                if event_data.get("event_name"):
+                    events = [event for event in events if title_matches(event_data["event_name"], event["summary"])]
+
+                if not events:
+                    response = render_not_found(event_data, matched_events.get("failed_calendars", []))
+                    await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
                     conversation_state.add_message(chat_id, "assistant", response)
                     return {"status": "ok"}
 
-                events = matched_events["events"]
-                logger.info(f"================> Matched events: {events}")
-                event_id = None
-                # if len(events) == 1:
-                #     event_id = events[0]["id"]
-                #     ai_response = await get_ai_response(event_data, history)
-                #     await send_telegram_message(chat_id, ai_response)
-                # else:
-                event_list = "\n".join(
-                    [f"{idx + 1}. {event['summary']} - {event['start']}" for idx, event in enumerate(events)]
-                )
-                event_id = events[0]["id"]
-                ai_response = await get_ai_response(event_data, history)
-                await send_telegram_message(chat_id, ai_response)
+                logger.debug("Matched events: %s", events)
+
+                # Bulk updates need a name to match, or they would touch every event in the range
+                bulk = event_data.get("apply_to_all") and len(events) > 1 and (
+                    event_data["intent"] == "delete" or event_data.get("event_name"))
+                if bulk:
+                    # "Cancel all my meetings tomorrow": after a "yes", one batch request instead of a round-trip per event
+                    intent = event_data["intent"]
+                    try:
+                        changes = bulk_update_data(events, event_data) if intent == "update" else [None] * len(events)
+                    except ValueError as e:
+                        response = render_bulk_refused(intent, len(events), str(e))
+                    else:
+                        pending_bulk_changes.set(chat_id, (intent, events, changes))
+                        response = render_bulk_confirm(intent, events)
+                    await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
+                    conversation_state.add_message(chat_id, "assistant", response)
+                    return {"status": "ok"}
+
+                target = pick_target(events, event_data.get("event_name"))
+                if target is None:
+                    # No event is certainly the one meant: the only case that still needs the LLM, to ask which one
+                    candidates = [{"summary": event["summary"], "start": event["start"]} for event in events]
+                    ai_response = await send_ai_response(chat_id, {**event_data, "matching_events": candidates}, history)
+                    conversation_state.add_message(chat_id, "assistant", ai_response)
+                    return {"status": "ok"}
 
-                # Proceed with update or delete after getting event_id
-                if event_id:
-                    if event_data["intent"] == "update":
-                        calendar_response = calendar_service.update_event(event_id, event_data)
-                        if calendar_response["success"]:
-                            await send_telegram_message(
-                                chat_id, f"Event updated successfully! Here's the link to your event: {calendar_response['event_link']}"
-                            )
-                    elif event_data["intent"] == "delete":
-                        calendar_response = calendar_service.delete_event(event_id)
-                        logger.info(f"DELETE{calendar_response}")
-                        if calendar_response["success"]:
-                            await send_telegram_message(chat_id, "Event deleted successfully!")
-                # Add AI response to conversation history
-                conversation_state.add_message(chat_id, "assistant", ai_response)
+                if event_data["intent"] == "update":
+                    calendar_response = await calendar_service.update_event(
+                        chat_id, target["id"], event_data, target["calendar_id"]
+                    )
+                    response = (render_updated(calendar_response["event"]) if calendar_response["success"]
+                                else render_failure("update", calendar_response.get("message")))
+                else:
+                    calendar_response = await calendar_service.delete_event(chat_id, target["id"], target["calendar_id"])
+                    logger.debug("Delete result: %s", calendar_response)
+                    response = (render_deleted(target) if calendar_response["success"]
+                                else render_failure("delete", calendar_response.get("message")))
+                await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
+                conversation_state.add_message(chat_id, "assistant", response)
                 return {"status": "ok"}
 
             elif event_data["intent"] == "query":
                 # Query events in Google Calendar based on the event details
-                matched_events = calendar_service.query_events({
+                matched_events = await calendar_service.query_events(chat_id, {
                     "event_name": event_data.get("event_name", ""),
-                    "date": event_data.get("date", "")
+                    "date": event_data.get("date", ""),
+                    "end_date": event_data.get("end_date")
                 })
 
                 if not matched_events["success"] or not matched_events["events"]:
-                    await send_telegram_message(chat_id, "No matching events found.")
-                    return {"status": "ok"}
-
-                events = matched_events["events"]
-                # logger.info(f"================> Matched events: {events}")
-
-                if len(events) == 1:
-                    event_id = events[0]["id"]
-                    ai_response = await get_ai_response(events[0], history)
-                    await send_telegram_message(chat_id, ai_response)
+                    response = render_not_found(event_data, matched_events.get("failed_calendars", []))
                 else:
-                    event_list = "\n".join(
-                        [f"{idx + 1}. {event['summary']} - {event['start']}" for idx, event in enumerate(events)]
+                    # Capped and, for long ranges, summarized per day
+                    response = render_event_list(
+                        matched_events["events"],
+                        matched_events.get("truncated", False),
+                        matched_events.get("failed_calendars", []),
                     )
-                    ai_response = await get_ai_response(event_list, history)
-                    await send_telegram_message(chat_id, ai_response)
-                # Add AI response to conversation history
-                conversation_state.add_message(chat_id, "assistant", ai_response)
+                await send_telegram_message(chat_id, response, parse_mode="MarkdownV2")
+                conversation_state.add_message(chat_id, "assistant", response)
                 return {"status": "ok"}
 
         # In case confirmation is needed (handling as needed)
-        ai_response = await get_ai_response(event_data, history)
+        ai_response = await send_ai_response(chat_id, event_data, history)
         # Add AI response to conversation history
         conversation_state.add_message(chat_id, "assistant", ai_response)
-        await send_telegram_message(chat_id, ai_response)
         return {"status": "ok"}
             
     except Exception as e:
@@ -173,10 +259,47 @@ async def telegram_webhook(update: TelegramUpdate):
             "I apologize, but I'm having trouble processing your message right now. Please try again later."
         )
         logger.error(f"======>Error processing message: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        raise
     
 
 
+def needs_llm(update: TelegramUpdate) -> bool:
+    """Text the fast path would not answer alone; only such messages are held back and merged."""
+    return is_text(update) and not fast_path_router.answers(update.message["text"])
+
+
+update_dispatcher = UpdateDispatcher(process_update, mergeable=needs_llm)
+token_refresher = TokenRefresher(calendar_service)
+telegram_poller = TelegramPoller(update_dispatcher)
+
+
+def service_stats():
+    """Gauges from the stats() the services already keep, gathered at scrape time."""
+    gauges = {}
+    for prefix, stats, label in (
+        ("calbot_fast_path", fast_path_router.stats(), None),
+        ("calbot_llm_cache", llm_cache.stats(), "site"),
+        ("calbot_calendar", calendar_service.cache_stats(), None),
+        ("calbot_ttft", ttft_stats(), None),
+        ("calbot_updates", update_dispatcher.stats(), None),
+        ("calbot_history", history_compactor.stats(), None),
+        ("calbot_conversations", conversation_state.stats(), None),
+        ("calbot_token_refresh", token_refresher.stats(), None),
+        ("calbot_polling", telegram_poller.stats(), None),
+    ):
+        gauges.update(stats_gauges(prefix, stats, label))
+    return gauges
+
+
+registry.add_collector(service_stats)
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/oauth2callback")
 async def oauth_callback(request: Request):
     """Handle Google OAuth callback."""
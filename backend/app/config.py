@@ -5,7 +5,6 @@ load_dotenv()
 
 TELEGRAM_API_TOKEN = os.getenv("TELEGRAM_API_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL = "gpt-4o"
 GOOGLE_CLIENT_SECRET_FILE = os.getenv("GOOGLE_CREDENTIALS_FILE")
 GOOGLE_API_SCOPES = ['https://www.googleapis.com/auth/calendar']
 OAUTH_REDIRECT_PATH = "/oauth2callback"
@@ -13,4 +12,127 @@ OAUTH_REDIRECT_PATH = "/oauth2callback"
 API_HOST = os.getenv("API_HOST", "0.0.0.0")  # Use 0.0.0.0 by default
 API_PORT = int(os.getenv("API_PORT", 8060))  # Use 8060 by default
 
-LITELLM_MODEL = os.getenv("LITELLM_MODEL", "gpt-4o")
\ No newline at end of file
+LITELLM_MODEL = os.getenv("LITELLM_MODEL", "gpt-4o")
+
+# Model tiers: intent extraction uses the large model; relevancy, small talk, replies and
+# history summaries use the fast one
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", LITELLM_MODEL)
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gpt-4o-mini")
+# Per-call timeout (seconds), retries of timeouts, 429s and 5xx with jittered exponential backoff,
+# and a second, hedged request when the first has not answered after LLM_HEDGE_AFTER seconds (0 disables)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 20))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 0.5))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", 0))
+# A streamed reply stops when no chunk arrives for LLM_STREAM_CHUNK_TIMEOUT seconds
+# or it has been streaming for LLM_STREAM_TIMEOUT seconds in total
+LLM_STREAM_CHUNK_TIMEOUT = float(os.getenv("LLM_STREAM_CHUNK_TIMEOUT", 10))
+LLM_STREAM_TIMEOUT = float(os.getenv("LLM_STREAM_TIMEOUT", 60))
+
+# "combined" classifies relevancy and extracts intent in one LLM call,
+# "split" keeps the original check_relevancy -> extract_intent round-trips.
+NLP_MODE = os.getenv("NLP_MODE", "combined")
+
+# Deterministic fast path that answers obvious messages without an LLM call
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", 0.8))
+
+# Shared Telegram Bot API client
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "true").lower() == "true"
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_CONNECTIONS", 20))
+TELEGRAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("TELEGRAM_MAX_KEEPALIVE_CONNECTIONS", 10))
+TELEGRAM_KEEPALIVE_EXPIRY = float(os.getenv("TELEGRAM_KEEPALIVE_EXPIRY", 60))
+TELEGRAM_REQUEST_TIMEOUT = float(os.getenv("TELEGRAM_REQUEST_TIMEOUT", 10))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 3))
+# Streamed replies are shown progressively, editing the message at most once per interval (seconds)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+TELEGRAM_EDIT_INTERVAL = float(os.getenv("TELEGRAM_EDIT_INTERVAL", 1.0))
+
+# Google Calendar calls run on a bounded thread pool off the event loop
+CALENDAR_MAX_WORKERS = int(os.getenv("CALENDAR_MAX_WORKERS", 8))
+CALENDAR_CALL_TIMEOUT = float(os.getenv("CALENDAR_CALL_TIMEOUT", 30))
+CALENDAR_SETTINGS_CACHE_TTL = float(os.getenv("CALENDAR_SETTINGS_CACHE_TTL", 3600))
+
+# Local events mirror per calendar: window around today, minimum seconds between
+# incremental syncs, and the title similarity needed for an event_name match
+EVENTS_CACHE_ENABLED = os.getenv("EVENTS_CACHE_ENABLED", "true").lower() == "true"
+EVENTS_CACHE_PAST_DAYS = int(os.getenv("EVENTS_CACHE_PAST_DAYS", 7))
+EVENTS_CACHE_FUTURE_DAYS = int(os.getenv("EVENTS_CACHE_FUTURE_DAYS", 60))
+EVENTS_CACHE_SYNC_INTERVAL = float(os.getenv("EVENTS_CACHE_SYNC_INTERVAL", 5))
+EVENTS_CACHE_MATCH_THRESHOLD = float(os.getenv("EVENTS_CACHE_MATCH_THRESHOLD", 0.6))
+
+# Event queries: page size for listing, cap on returned events and longest range
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", 50))
+QUERY_MAX_EVENTS = int(os.getenv("QUERY_MAX_EVENTS", 50))
+QUERY_MAX_RANGE_DAYS = int(os.getenv("QUERY_MAX_RANGE_DAYS", 92))
+# Listings longer than this are summarized per day instead of listed in full
+QUERY_DETAIL_LIMIT = int(os.getenv("QUERY_DETAIL_LIMIT", 15))
+
+# Calendars queried for events, resolved per chat against that account's calendar list: "primary" is the
+# chat's own calendar, "selected" every calendar shown in its Google Calendar, other ids are used only where
+# visible. Then how many are queried at once and the timeout for each
+CONNECTED_CALENDARS = [c.strip() for c in os.getenv("CONNECTED_CALENDARS", "primary").split(",") if c.strip()]
+CALENDAR_FANOUT_CONCURRENCY = int(os.getenv("CALENDAR_FANOUT_CONCURRENCY", 4))
+CALENDAR_FANOUT_TIMEOUT = float(os.getenv("CALENDAR_FANOUT_TIMEOUT", 10))
+# Calendar API mutations sent per batch HTTP request (the API accepts up to 50)
+CALENDAR_BATCH_SIZE = int(os.getenv("CALENDAR_BATCH_SIZE", 50))
+# How long (seconds) a bulk update or delete waits for the user's "yes" before it is dropped
+BULK_CONFIRM_TTL = float(os.getenv("BULK_CONFIRM_TTL", 300))
+
+# Per-chat Google credentials: encrypted files, their key and how many Calendar clients stay built in memory
+CREDENTIALS_DIR = os.getenv("CREDENTIALS_DIR", "/data/credentials")
+CREDENTIALS_KEY = os.getenv("CREDENTIALS_KEY", "")
+CREDENTIALS_KEY_PATH = os.getenv("CREDENTIALS_KEY_PATH", "/data/credentials.key")
+OAUTH_STATE_TTL = float(os.getenv("OAUTH_STATE_TTL", 600))
+CALENDAR_CLIENT_CACHE_SIZE = int(os.getenv("CALENDAR_CLIENT_CACHE_SIZE", 256))
+
+# Background token refresh: how often to check, how long before expiry to renew,
+# and how long a chat may stay idle before its tokens are no longer kept warm
+TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", 60))
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", 600))
+TOKEN_REFRESH_IDLE_TTL = float(os.getenv("TOKEN_REFRESH_IDLE_TTL", 7 * 86400))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", 4))
+
+# Webhook updates are queued and processed by background workers
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_ENQUEUE_TIMEOUT = float(os.getenv("UPDATE_ENQUEUE_TIMEOUT", 1.0))
+UPDATE_DEDUPE_WINDOW = int(os.getenv("UPDATE_DEDUPE_WINDOW", 10000))
+# Messages for the LLM a chat sends within the window of each other (seconds) or while its previous message
+# is being handled are merged into one update, at most UPDATE_COALESCE_MAX at a time; 0 disables the wait
+UPDATE_COALESCE_WINDOW = float(os.getenv("UPDATE_COALESCE_WINDOW", 0.4))
+UPDATE_COALESCE_MAX = int(os.getenv("UPDATE_COALESCE_MAX", 5))
+
+# How updates reach the bot: "webhook" (falls back to polling if setWebhook fails) or "polling".
+# Polling long-polls getUpdates for up to TELEGRAM_POLL_LIMIT updates, waiting TELEGRAM_POLL_TIMEOUT seconds
+TELEGRAM_INGESTION_MODE = os.getenv("TELEGRAM_INGESTION_MODE", "webhook").lower()
+TELEGRAM_POLL_LIMIT = int(os.getenv("TELEGRAM_POLL_LIMIT", 100))
+TELEGRAM_POLL_TIMEOUT = float(os.getenv("TELEGRAM_POLL_TIMEOUT", 30))
+TELEGRAM_POLL_RETRY_DELAY = float(os.getenv("TELEGRAM_POLL_RETRY_DELAY", 1.0))
+
+# Conversation storage: "memory" (per process) or "sqlite" (shared by workers, survives restarts)
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "memory")
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "/data/conversations.db")
+CONVERSATION_BATCH_SIZE = int(os.getenv("CONVERSATION_BATCH_SIZE", 100))
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", 0.2))
+
+# Conversation history bounds: messages kept per chat, chats kept, idle seconds before a chat is dropped
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", 20))
+CONVERSATION_MAX_CHATS = int(os.getenv("CONVERSATION_MAX_CHATS", 10000))
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", 86400))
+
+# Conversation history embedded in prompts is capped at this many (estimated) tokens;
+# older turns are folded into a rolling per-chat summary
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 600))
+HISTORY_SUMMARY_BATCH_TURNS = int(os.getenv("HISTORY_SUMMARY_BATCH_TURNS", 4))
+HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", 10000))
+
+# Cache for relevancy and small-talk LLM responses; set LLM_CACHE_DISK_PATH to keep it across restarts
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 5000))
+LLM_CACHE_DISK_PATH = os.getenv("LLM_CACHE_DISK_PATH", "")
+LLM_CACHE_HISTORY_WINDOW = int(os.getenv("LLM_CACHE_HISTORY_WINDOW", 2))
+
+# Import litellm and parse the Calendar discovery document in the background right after startup
+WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "true").lower() == "true"
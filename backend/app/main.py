@@ -1,46 +1,60 @@
+import asyncio
 import uvicorn
-import httpx
 import os
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
-from app.api.routes import router
-from app.services.telegram import TelegramBotService
-from app.config import API_HOST, API_PORT, TELEGRAM_API_TOKEN
+from app.api.routes import router, calendar_service, update_dispatcher, token_refresher, telegram_poller
+from app.services.telegram import telegram_service
+from app.services.conversation import conversation_state
+from app.services.google_calendar import calendar_discovery_document
+from app.utils.llm import load_litellm
+from app.config import API_HOST, API_PORT, WARM_UP_ON_START, TELEGRAM_INGESTION_MODE
+
+
+def warm_up():
+    """Load what the first LLM and Calendar calls need, off the request path."""
+    try:
+        load_litellm()
+        calendar_discovery_document()
+    except Exception as e:
+        print(f"Warm-up failed, loading on first use instead: {e}")
 
-# Global Telegram service instance
-telegram_service = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage startup and shutdown events."""
-    global telegram_service
-    
-    # Startup: Initialize Telegram bot service
-    telegram_service = TelegramBotService()
-    telegram_service.start()
+    # Startup: Open the shared Telegram client, start the update workers and keep Google tokens fresh
+    await telegram_service.start()
+    await update_dispatcher.start()
+    await token_refresher.start()
+    if WARM_UP_ON_START:
+        # Runs in a thread while the app already accepts webhooks
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
     
-    # Set up Telegram webhook
-    backend_url = os.getenv("BACKEND_URL", "http://localhost:8060")
-    WEBHOOK_URL = f"{backend_url}/webhook"
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}/setWebhook",
-            params={"url": WEBHOOK_URL}
-        )
-        if response.status_code != 200 or not response.json().get("ok"):
-            print(f"Error setting webhook: {response.status_code} - {response.text}")
+    # Set up Telegram webhook, or poll for updates when asked to or when the webhook cannot be set
+    if TELEGRAM_INGESTION_MODE == "polling":
+        await telegram_service.delete_webhook()  # getUpdates is refused while a webhook is set
+        await telegram_poller.start()
+    else:
+        backend_url = os.getenv("BACKEND_URL", "http://localhost:8060")
+        WEBHOOK_URL = f"{backend_url}/webhook"
+
+        response = await telegram_service.set_webhook(WEBHOOK_URL)
+        if not response.get("ok"):
+            print(f"Error setting webhook: {response.get('error_code')} - {response.get('description')}")
             print("Continuing with polling method...")
+            await telegram_poller.start()
 
     yield  # Hand control back to FastAPI
 
-    # Shutdown: Clean up Telegram service
-    if telegram_service:
-        telegram_service.stop()
-    
-    # Remove webhook on shutdown
-    async with httpx.AsyncClient() as client:
-        await client.get(f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}/deleteWebhook")
+    # Shutdown: Stop polling and remove the webhook, finish queued updates, then close the shared Telegram client
+    await telegram_poller.stop()
+    await telegram_service.delete_webhook()
+    await update_dispatcher.stop()
+    await token_refresher.stop()
+    await telegram_service.stop()
+    calendar_service.shutdown()
+    conversation_state.close()
 
 app = FastAPI(title="Calendar AI Agent", lifespan=lifespan)
 app.include_router(router)
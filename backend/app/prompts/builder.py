@@ -0,0 +1,36 @@
+from typing import List, Optional
+from app.utils.helpers import format_conversation_history
+
+
+def build_messages(
+    system_prompt: str,
+    user_message: str,
+    history: Optional[list] = None,
+    current_date: Optional[str] = None,
+    instruction: str = "",
+    **sections,
+) -> List[dict]:
+    """Chat messages for an LLM call.
+
+    The system message is the prompt constant itself and is never formatted.
+    Everything that changes between calls follows it: the conversation
+    history as one message, then one message with the date, any ``sections``
+    (``event_data=...`` becomes an ``<EVENT_DATA>`` block), the user message
+    and the closing ``instruction``.
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    if history:
+        messages.append({
+            "role": "user",
+            "content": f"Here is the conversation history:\n{format_conversation_history(history)}",
+        })
+    parts = []
+    if current_date:
+        parts.append(f"current date is: {current_date}")
+    for name, value in sections.items():
+        parts.append(f"<{name.upper()}>\n{value}\n</{name.upper()}>")
+    parts.append(f"User message: {user_message}")
+    if instruction:
+        parts.append(instruction)
+    messages.append({"role": "user", "content": "\n\n".join(parts)})
+    return messages
@@ -0,0 +1,17 @@
+# Used by HistoryCompactor to fold older conversation turns into a rolling summary.
+HISTORY_SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and a calendar assistant bot.
+
+Update the existing summary with the new conversation turns below.
+- Keep every detail that matters for calendar tasks: event names, dates, times, participants, locations, and pending confirmations or open questions.
+- Drop greetings, small talk and anything already resolved unless it is needed to understand later turns.
+- Write at most 5 short sentences in plain text.
+
+Existing summary:
+{summary}
+
+New conversation turns:
+{new_turns}
+
+Updated summary:
+"""
@@ -20,8 +20,6 @@ Return a JSON object with:
 - "reason": A short explanation of why it's relevant or not.
 
 Remember to consider the relevance of user message in the context of the conversation history!
+"""
 
-Conversation history: "{conversation_history}"
-
-JSON Response:
-"""
\ No newline at end of file
+RELEVANCY_CLASSIFIER_INSTRUCTION = "JSON Response:"
\ No newline at end of file
@@ -9,11 +9,6 @@ Instead of ignoring them, respond naturally in a friendly way.
 - If the message is small talk (e.g., "How are you?", "What's up?"), reply casually, keeping it short and engaging.  
 - If the message is completely unrelated (e.g., "What's your favorite movie?", "Tell me a joke", "write some code", etc), explain your role briefly.  
 - If the message is unclear, politely ask the user if they need help with their calendar.  
+"""
 
-User message: "{user_message}"  
-Conversation history: "{conversation_history}"
-current date is: {current_date}
-
-Generate a natural response.
-
-"""
\ No newline at end of file
+SMALL_TALK_INSTRUCTION = "Generate a natural response."
\ No newline at end of file
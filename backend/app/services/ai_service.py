@@ -1,44 +1,266 @@
+from collections import deque
 from datetime import datetime
-from app.config import OPENAI_API_KEY, OPENAI_MODEL
+from app.config import (
+    STREAM_RESPONSES,
+    LLM_LARGE_MODEL,
+    LLM_FAST_MODEL,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF,
+    LLM_HEDGE_AFTER,
+    LLM_STREAM_CHUNK_TIMEOUT,
+    LLM_STREAM_TIMEOUT,
+)
 from app.prompts.agent_system_prompt import AGENT_SYSTEM_PROMPT
-from app.prompts.small_talk_system_prompt import SMALL_TALK_SYSTEM_PROMPT
-from app.utils.helpers import format_conversation_history
-from litellm import acompletion
-from typing import Dict
+from app.prompts.builder import build_messages
+from app.prompts.small_talk_system_prompt import SMALL_TALK_SYSTEM_PROMPT, SMALL_TALK_INSTRUCTION
+from app.services.llm_cache import llm_cache
+from app.services.telegram import send_telegram_message, telegram_service
+from app.utils.llm import acompletion
+from app.utils.metrics import llm_hedges, llm_retries, llm_seconds, timed
+from typing import AsyncIterator, Dict, Optional
+import asyncio
 import httpx
 import logging
 import json
-import litellm
+import random
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Time-to-first-token of streamed replies, in seconds
+ttft_samples = deque(maxlen=1000)
+
+# Which model tier handles each kind of LLM call
+TASK_TIERS = {
+    "extraction": "large",
+    "relevancy": "fast",
+    "small_talk": "fast",
+    "reply": "fast",
+    "summary": "fast",
+}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, rate limits and server-side errors; bad requests and auth errors are not retried."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409, 429) or (isinstance(status, int) and status >= 500)
+
+
+class ModelRouter:
+    """Send each LLM call to the model tier of its task, with a timeout, retries and hedging.
+
+    Every attempt gets ``timeout`` seconds. Timeouts and retryable errors are
+    retried up to ``max_retries`` times after an exponential backoff with
+    full jitter, so clients that failed together do not retry together. With
+    ``hedge_after`` set, a non-streamed call that has not answered after that
+    many seconds gets a second identical request and the first answer wins,
+    trading some extra spend for a shorter latency tail.
+    """
+
+    def __init__(
+        self,
+        models: Optional[Dict[str, str]] = None,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF,
+        hedge_after: float = LLM_HEDGE_AFTER,
+    ):
+        self.models = models or {"large": LLM_LARGE_MODEL, "fast": LLM_FAST_MODEL}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+
+    def model_for(self, task: str) -> str:
+        return self.models[TASK_TIERS[task]]
+
+    async def complete(self, task: str, timeout: Optional[float] = None, **kwargs):
+        """``acompletion`` on the task's model; ``timeout`` overrides the per-attempt default."""
+        model = self.model_for(task)
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await asyncio.wait_for(self._hedged(model, kwargs), timeout or self.timeout)
+                if kwargs.get("stream"):
+                    return self._timed_stream(response, model, task, started)
+                llm_seconds.observe(time.perf_counter() - started, model=model, task=task)
+                return response
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                logger.warning(f"LLM {task} call to {model} failed ({e!r}), retrying in {delay:.2f}s")
+                llm_retries.inc(model=model)
+                await asyncio.sleep(delay)
+
+    async def _timed_stream(self, chunks, model: str, task: str, started: float):
+        """Pass a stream through; its latency is observed once it has been read to the end or closed."""
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            llm_seconds.observe(time.perf_counter() - started, model=model, task=task)
+
+    async def _hedged(self, model: str, kwargs: dict):
+        if not self.hedge_after or kwargs.get("stream"):
+            return await acompletion(model=model, **kwargs)
+
+        attempts = [asyncio.ensure_future(acompletion(model=model, **kwargs))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.hedge_after)
+            if not done:
+                attempts.append(asyncio.ensure_future(acompletion(model=model, **kwargs)))
+            pending, error = set(attempts), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(attempts) > 1:
+                            llm_hedges.inc(model=model, outcome="won" if task is attempts[1] else "lost")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark a losing failure as retrieved
+
+
+model_router = ModelRouter()
+
+
+def _ai_messages(event_data: Dict, conversation_history: list) -> list:
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    user_message = conversation_history[-1].content
+    return build_messages(AGENT_SYSTEM_PROMPT, user_message, current_date=current_date, event_data=event_data)
+
+
+def _small_talk_messages(user_message: str, conversation_history: list) -> list:
+    current_date = datetime.now().strftime("%Y-%m-%d")
+    return build_messages(SMALL_TALK_SYSTEM_PROMPT, user_message, conversation_history, current_date,
+                          SMALL_TALK_INSTRUCTION)
+
+
+def _small_talk_cache_key(user_message: str, conversation_history: list) -> str:
+    return llm_cache.make_key(SMALL_TALK_SYSTEM_PROMPT, user_message, conversation_history, model_router.model_for("small_talk"))
+
+
 async def get_ai_response(event_data: Dict, conversation_history: list) -> str:
     
     if len(conversation_history) == 0:
         return "Sorry, I'm not sure how to respond to that."
     
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    messages = [{"role": "system", "content": AGENT_SYSTEM_PROMPT.format(event_data=event_data, current_date=current_date)}]
-    user_message = conversation_history[-1]["content"]
-    messages.append({"role": "user", "content": user_message})
+    messages = _ai_messages(event_data, conversation_history)
     
-    response = await acompletion(
-        api_key=OPENAI_API_KEY, model=OPENAI_MODEL, messages=messages, max_tokens=200
-    )
-    logger.info(f'------------------------------------>Response: {response["choices"][0]["message"]["content"]}')
+    response = await model_router.complete("reply", messages=messages, max_tokens=200)
+    logger.debug("AI response: %s", response["choices"][0]["message"]["content"])
     return response["choices"][0]["message"]["content"]
 
 
 async def get_small_talk_response(user_message: str, conversation_history: list) -> str:
     
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    formatted_history = format_conversation_history(conversation_history)
-    messages = [{"role": "system", "content": SMALL_TALK_SYSTEM_PROMPT.format(user_message=user_message, conversation_history=formatted_history, current_date=current_date)}]
-    messages.append({"role": "user", "content": user_message})
+    cache_key = _small_talk_cache_key(user_message, conversation_history)
+    cached = llm_cache.get("small_talk", cache_key)
+    if cached is not None:
+        return cached
+
+    messages = _small_talk_messages(user_message, conversation_history)
     
-    response = await acompletion(
-        api_key=OPENAI_API_KEY, model=OPENAI_MODEL, messages=messages, max_tokens=200
+    response = await model_router.complete("small_talk", messages=messages, max_tokens=200)
+    reply = response["choices"][0]["message"]["content"]
+    llm_cache.set("small_talk", cache_key, reply)
+    return reply
+
+
+async def stream_completion(
+    task: str,
+    messages: list,
+    chunk_timeout: float = LLM_STREAM_CHUNK_TIMEOUT,
+    timeout: float = LLM_STREAM_TIMEOUT,
+) -> AsyncIterator[str]:
+    """Yield the reply's text deltas as they arrive, recording time-to-first-token.
+
+    A stream that stalls for ``chunk_timeout`` seconds or runs past ``timeout``
+    is cut off: it raises ``asyncio.TimeoutError`` if nothing was yielded yet,
+    otherwise it ends early and the partial reply stands.
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    response = await model_router.complete(task, messages=messages, max_tokens=200, stream=True)
+    chunks = response.__aiter__()
+    first_token = True
+    while True:
+        try:
+            chunk = await asyncio.wait_for(
+                chunks.__anext__(), min(chunk_timeout, max(deadline - time.monotonic(), 0))
+            )
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            logger.warning(f"LLM stream for {task} timed out after {time.perf_counter() - started:.1f}s")
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+            if first_token:
+                raise
+            return
+        # The last chunk may only carry the usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if not delta:
+            continue
+        if first_token:
+            ttft_samples.append(time.perf_counter() - started)
+            first_token = False
+        yield delta
+
+
+def ttft_stats() -> Dict[str, float]:
+    """Summary of recent time-to-first-token samples, in milliseconds."""
+    samples = sorted(ttft_samples)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+    }
+
+
+@timed("ai_response")
+async def send_ai_response(chat_id: int, event_data: Dict, conversation_history: list) -> str:
+    """Generate the agent reply and deliver it to the chat, streaming it when enabled."""
+    if not STREAM_RESPONSES or len(conversation_history) == 0:
+        ai_response = await get_ai_response(event_data, conversation_history)
+        await send_telegram_message(chat_id, ai_response)
+        return ai_response
+
+    return await telegram_service.stream_message(
+        chat_id, stream_completion("reply", _ai_messages(event_data, conversation_history))
     )
-    return response["choices"][0]["message"]["content"]
\ No newline at end of file
+
+
+@timed("ai_response")
+async def send_small_talk_response(chat_id: int, user_message: str, conversation_history: list) -> str:
+    """Generate a small-talk reply and deliver it to the chat, streaming it when enabled."""
+    cache_key = _small_talk_cache_key(user_message, conversation_history)
+    reply = llm_cache.get("small_talk", cache_key)
+    if reply is None and STREAM_RESPONSES:
+        reply = await telegram_service.stream_message(
+            chat_id, stream_completion("small_talk", _small_talk_messages(user_message, conversation_history))
+        )
+        if reply:
+            llm_cache.set("small_talk", cache_key, reply)
+        return reply
+
+    if reply is None:
+        reply = await get_small_talk_response(user_message, conversation_history)
+    await send_telegram_message(chat_id, reply)
+    return reply
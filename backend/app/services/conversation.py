@@ -1,22 +1,170 @@
-from datetime import datetime
-from typing import Dict
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List, NamedTuple, Optional
+from app.config import (
+    CONVERSATION_BACKEND,
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_MAX_CHATS,
+    CONVERSATION_IDLE_TTL,
+)
+import sys
+import time
+
+
+class Message(NamedTuple):
+    """A single conversation turn; a plain tuple, so it carries no per-instance dict."""
+    role: str
+    content: str
+    type: str = "text"
+    timestamp: float = 0.0
+
+
+class ConversationStore(ABC):
+    """Storage interface behind ConversationState."""
+
+    @abstractmethod
+    def append(self, chat_id: int, message: Message):
+        ...
+
+    @abstractmethod
+    def last(self, chat_id: int, limit: int) -> List[Message]:
+        """Return up to ``limit`` most recent messages of a chat, oldest first."""
+
+    @abstractmethod
+    def clear(self, chat_id: int):
+        ...
+
+    def flush(self):
+        """Persist buffered writes, if the store buffers any."""
+
+    def close(self):
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+def _message_size(message: Message) -> int:
+    return sys.getsizeof(message) + sys.getsizeof(message.content) + sys.getsizeof(message.timestamp)
+
+
+class ChatHistory:
+    __slots__ = ("messages", "last_active", "size")
+
+    def __init__(self, max_messages: int):
+        self.messages = deque(maxlen=max_messages)
+        self.last_active = time.monotonic()
+        # Approximate bytes held by this chat, kept up to date as messages come and go
+        self.size = sys.getsizeof(self) + sys.getsizeof(self.messages)
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Bounded in-process store.
+
+    Each chat keeps a ring buffer of its last ``max_messages`` messages. Whole
+    chats are evicted least-recently-active first once there are more than
+    ``max_chats`` of them, or after ``idle_ttl`` seconds without a message.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = CONVERSATION_MAX_MESSAGES,
+        max_chats: int = CONVERSATION_MAX_CHATS,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+    ):
+        self.max_messages = max_messages
+        self.max_chats = max_chats
+        self.idle_ttl = idle_ttl
+        self.evictions = 0
+        self.conversations: "OrderedDict[int, ChatHistory]" = OrderedDict()
+        # Running totals over every chat, so stats() does not walk the messages
+        self.message_count = 0
+        self.message_bytes = 0
+
+    def append(self, chat_id: int, message: Message):
+        chat = self.conversations.get(chat_id)
+        if chat is None:
+            chat = self.conversations[chat_id] = ChatHistory(self.max_messages)
+            self.message_bytes += chat.size
+        else:
+            self.conversations.move_to_end(chat_id)
+
+        size = _message_size(message)
+        if len(chat.messages) == chat.messages.maxlen:
+            size -= _message_size(chat.messages[0])  # pushed out of the ring buffer
+        else:
+            self.message_count += 1
+        chat.messages.append(message)
+        chat.size += size
+        self.message_bytes += size
+        chat.last_active = time.monotonic()
+        self._evict()
+
+    def last(self, chat_id: int, limit: int) -> List[Message]:
+        chat = self.conversations.get(chat_id)
+        if chat is None:
+            return []
+        return list(chat.messages)[-limit:]
+
+    def clear(self, chat_id: int):
+        chat = self.conversations.pop(chat_id, None)
+        if chat is not None:
+            self._forget(chat)
+
+    def _forget(self, chat: ChatHistory):
+        self.message_count -= len(chat.messages)
+        self.message_bytes -= chat.size
+
+    def _evict(self):
+        # Chats are ordered by last activity, so idle and excess chats are at the front
+        expire_before = time.monotonic() - self.idle_ttl
+        while self.conversations:
+            chat_id, chat = next(iter(self.conversations.items()))
+            if len(self.conversations) <= self.max_chats and chat.last_active >= expire_before:
+                break
+            del self.conversations[chat_id]
+            self._forget(chat)
+            self.evictions += 1
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by stored conversations (containers, records and strings)."""
+        return sys.getsizeof(self.conversations) + self.message_bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "chats": len(self.conversations),
+            "messages": self.message_count,
+            "evictions": self.evictions,
+            "memory_bytes": self.memory_usage(),
+        }
+
+
+def create_store(backend: str = CONVERSATION_BACKEND) -> ConversationStore:
+    if backend == "sqlite":
+        from app.services.conversation_sqlite import SQLiteConversationStore
+        return SQLiteConversationStore()
+    if backend == "memory":
+        return InMemoryConversationStore()
+    raise ValueError(f"Unknown conversation backend: {backend}")
+
 
 class ConversationState:
-    def __init__(self):
-        self.conversations: Dict[int, list] = {}
-        
+    def __init__(self, store: Optional[ConversationStore] = None):
+        self.store = store or create_store()
+
     def add_message(self, user_id: int, role: str, content: str, message_type: str = "text"):
-        if user_id not in self.conversations:
-            self.conversations[user_id] = []
-        
-        self.conversations[user_id].append({
-            "role": role,
-            "content": content,
-            "type": message_type,
-            "timestamp": datetime.now().isoformat()
-        })
-        
+        self.store.append(user_id, Message(role, content, message_type, time.time()))
+
     def get_conversation_history(self, user_id: int, max_messages: int = 10) -> list:
-        return self.conversations.get(user_id, [])[-max_messages:]
+        return self.store.last(user_id, max_messages)
+
+    def clear(self, user_id: int):
+        self.store.clear(user_id)
+
+    def close(self):
+        self.store.close()
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
 
 conversation_state = ConversationState()
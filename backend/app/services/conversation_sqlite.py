@@ -0,0 +1,251 @@
+from typing import Dict, List, Tuple
+from app.config import (
+    CONVERSATION_DB_PATH,
+    CONVERSATION_MAX_MESSAGES,
+    CONVERSATION_IDLE_TTL,
+    CONVERSATION_BATCH_SIZE,
+    CONVERSATION_FLUSH_INTERVAL,
+)
+from app.services.conversation import ConversationStore, Message
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    type TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, id);
+CREATE TABLE IF NOT EXISTS writers (
+    writer TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+_STOP = object()
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversation store in a local SQLite database, shared by every worker process.
+
+    The database runs in WAL mode so readers in other processes never block on
+    the writer. ``append`` only queues the message: a background writer thread
+    inserts queued messages in batches of up to ``batch_size`` per transaction,
+    at most ``flush_interval`` seconds after they were queued. Messages that
+    are still queued are merged into reads from this process.
+
+    Every queued message gets a sequence number, and each batch records the
+    last one it committed in the ``writers`` table, in the same transaction.
+    A read looks that up in the same snapshot as the messages, so it knows
+    which queued messages it already got from the database without holding
+    ``_lock`` around any database work.
+    """
+
+    def __init__(
+        self,
+        path: str = CONVERSATION_DB_PATH,
+        max_messages: int = CONVERSATION_MAX_MESSAGES,
+        idle_ttl: float = CONVERSATION_IDLE_TTL,
+        batch_size: int = CONVERSATION_BATCH_SIZE,
+        flush_interval: float = CONVERSATION_FLUSH_INTERVAL,
+    ):
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self.written = 0
+        # Table sizes for stats(), kept by the writer thread instead of counted on every call
+        self.chats = 0
+        self.messages = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._reader = self._connect()
+        self._reader.executescript(SCHEMA)
+        self._read_lock = threading.Lock()
+        self._id = uuid.uuid4().hex
+
+        # Messages queued but not yet committed, per chat, in append order, with their sequence numbers
+        self._pending: Dict[int, List[Tuple[int, Message]]] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    def append(self, chat_id: int, message: Message):
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._pending.setdefault(chat_id, []).append((seq, message))
+        self._queue.put((chat_id, seq, message))
+
+    def last(self, chat_id: int, limit: int) -> List[Message]:
+        # Snapshot the queue first: whatever leaves it before the read below was committed before it
+        with self._lock:
+            pending = list(self._pending.get(chat_id, ()))
+        with self._read_lock:
+            self._reader.execute("BEGIN")
+            try:
+                rows = self._reader.execute(
+                    "SELECT role, content, type, timestamp FROM messages "
+                    "WHERE chat_id = ? ORDER BY id DESC LIMIT ?",
+                    (chat_id, limit),
+                ).fetchall()
+                committed = self._reader.execute(
+                    "SELECT seq FROM writers WHERE writer = ?", (self._id,)
+                ).fetchone()
+            finally:
+                self._reader.execute("COMMIT")
+        committed = committed[0] if committed else 0
+        messages = [Message(*row) for row in reversed(rows)]
+        messages += [message for seq, message in pending if seq > committed]
+        return messages[-min(limit, self.max_messages):]
+
+    def clear(self, chat_id: int):
+        self.flush()
+        with self._read_lock:
+            self._reader.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+
+    def flush(self):
+        """Block until every message queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._reader.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = sum(len(items) for items in self._pending.values())
+        return {
+            "chats": self.chats,
+            "messages": self.messages,
+            "pending": pending,
+            "batches": self.batches,
+            "written": self.written,
+        }
+
+    def _write_loop(self):
+        connection = self._connect()
+        self._count(connection)
+        last_prune = time.monotonic()
+        running = True
+        while running:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if not running or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(connection, batch)
+            if time.monotonic() - last_prune > 60:
+                self._prune(connection)
+                # Recount now and then: other processes write to the same database
+                self._count(connection)
+                last_prune = time.monotonic()
+            for waiter in waiters:
+                waiter.set()
+        try:
+            connection.execute("DELETE FROM writers WHERE writer = ?", (self._id,))
+        except sqlite3.Error:
+            logger.exception("Failed to drop the conversation writer record")
+        connection.close()
+
+    def _count(self, connection: sqlite3.Connection):
+        try:
+            self.chats, self.messages = connection.execute(
+                "SELECT COUNT(DISTINCT chat_id), COUNT(*) FROM messages"
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Failed to count conversation messages")
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: list):
+        last_seq = batch[-1][1]
+        try:
+            connection.execute("BEGIN")
+            chat_ids = {chat_id for chat_id, _, _ in batch}
+            new_chats = sum(
+                connection.execute("SELECT 1 FROM messages WHERE chat_id = ? LIMIT 1", (chat_id,)).fetchone() is None
+                for chat_id in chat_ids
+            )
+            connection.executemany(
+                "INSERT INTO messages (chat_id, role, content, type, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(chat_id, *message) for chat_id, _, message in batch],
+            )
+            # Keep only the last max_messages per touched chat, like the in-memory ring buffer
+            dropped = 0
+            for chat_id in chat_ids:
+                dropped += connection.execute(
+                    "DELETE FROM messages WHERE chat_id = ? AND id <= ("
+                    "SELECT id FROM messages WHERE chat_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (chat_id, chat_id, self.max_messages),
+                ).rowcount
+            connection.execute(
+                "INSERT OR REPLACE INTO writers (writer, seq) VALUES (?, ?)", (self._id, last_seq)
+            )
+            connection.execute("COMMIT")
+            self.batches += 1
+            self.written += len(batch)
+            self.messages += len(batch) - dropped
+            self.chats += new_chats
+        except sqlite3.Error:
+            logger.exception(f"Failed to write {len(batch)} conversation messages")
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+        finally:
+            # Queued messages up to last_seq are now either in the database or lost
+            with self._lock:
+                for chat_id in {chat_id for chat_id, _, _ in batch}:
+                    pending = [item for item in self._pending.get(chat_id, ()) if item[0] > last_seq]
+                    if pending:
+                        self._pending[chat_id] = pending
+                    else:
+                        self._pending.pop(chat_id, None)
+
+    def _prune(self, connection: sqlite3.Connection):
+        """Drop messages of chats idle for longer than ``idle_ttl``."""
+        try:
+            connection.execute(
+                "DELETE FROM messages WHERE chat_id IN ("
+                "SELECT chat_id FROM messages GROUP BY chat_id HAVING MAX(timestamp) < ?)",
+                (time.time() - self.idle_ttl,),
+            )
+        except sqlite3.Error:
+            logger.exception("Failed to prune idle conversations")
@@ -0,0 +1,148 @@
+from typing import Iterator, Optional
+from cryptography.fernet import Fernet, InvalidToken
+from google.oauth2.credentials import Credentials
+from app.config import (
+    CREDENTIALS_DIR,
+    CREDENTIALS_KEY,
+    CREDENTIALS_KEY_PATH,
+    OAUTH_STATE_TTL,
+)
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def write_atomic(path: str, data: bytes):
+    """Write ``data`` to a temp file next to ``path`` and rename it over, so readers never see a partial file."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_or_create_key(key: str = CREDENTIALS_KEY, key_path: str = CREDENTIALS_KEY_PATH) -> bytes:
+    """Encryption key from the environment, else from ``key_path``, generating it there on first use."""
+    if key:
+        return key.encode()
+    if os.path.exists(key_path):
+        with open(key_path, "rb") as f:
+            return f.read().strip()
+
+    if os.path.dirname(key_path):
+        os.makedirs(os.path.dirname(key_path), exist_ok=True)
+    generated = Fernet.generate_key()
+    try:
+        # O_EXCL: if another worker created the key first, use theirs
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(key_path, "rb") as f:
+            return f.read().strip()
+    with os.fdopen(fd, "wb") as f:
+        f.write(generated)
+    logger.info(f"Generated a new credentials encryption key at {key_path}")
+    return generated
+
+
+class CredentialStore:
+    """Encrypted per-chat Google credentials and pending OAuth flows on local disk.
+
+    Each chat's credentials live in their own Fernet-encrypted file under
+    ``directory``; each OAuth flow in progress is a file named after its
+    ``state`` parameter, so concurrent sign-ins from different chats (or
+    worker processes sharing the directory) never overwrite each other.
+    """
+
+    def __init__(self, directory: str = CREDENTIALS_DIR, key: Optional[bytes] = None,
+                 state_ttl: float = OAUTH_STATE_TTL):
+        self.directory = directory
+        self.state_ttl = state_ttl
+        self._fernet = Fernet(key or load_or_create_key())
+        os.makedirs(os.path.join(directory, "oauth"), exist_ok=True)
+
+    def _token_path(self, chat_id: int) -> str:
+        return os.path.join(self.directory, f"{int(chat_id)}.token")
+
+    def _state_path(self, state: str) -> str:
+        if not re.fullmatch(r"[\w-]+", state):
+            raise ValueError("Malformed OAuth state")
+        return os.path.join(self.directory, "oauth", state)
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                return json.loads(self._fernet.decrypt(f.read()))
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError) as e:
+            logger.error(f"Discarding unreadable credentials file {path}: {e}")
+            os.remove(path)
+            return None
+
+    def _write(self, path: str, value: dict):
+        write_atomic(path, self._fernet.encrypt(json.dumps(value).encode()))
+
+    def load(self, chat_id: int) -> Optional[Credentials]:
+        info = self._read(self._token_path(chat_id))
+        return Credentials.from_authorized_user_info(info) if info else None
+
+    def save(self, chat_id: int, credentials: Credentials):
+        self._write(self._token_path(chat_id), json.loads(credentials.to_json()))
+
+    def delete(self, chat_id: int):
+        try:
+            os.remove(self._token_path(chat_id))
+        except FileNotFoundError:
+            pass
+
+    def chat_ids(self) -> Iterator[int]:
+        """Chats that have stored credentials."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".token"):
+                yield int(name[:-len(".token")])
+
+    def save_flow(self, state: str, chat_id: int, code_verifier: Optional[str], redirect_uri: str):
+        """Remember an OAuth flow started by ``chat_id`` until its callback arrives."""
+        self._write(self._state_path(state), {
+            "chat_id": chat_id,
+            "code_verifier": code_verifier,
+            "redirect_uri": redirect_uri,
+            "created_at": time.time(),
+        })
+        self._prune_flows()
+
+    def pop_flow(self, state: str) -> Optional[dict]:
+        """Return and forget the flow for ``state``; None if unknown or expired."""
+        path = self._state_path(state)
+        flow = self._read(path)
+        if flow is None:
+            return None
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return None  # another worker consumed this flow first
+        if time.time() - flow["created_at"] > self.state_ttl:
+            return None
+        return flow
+
+    def _prune_flows(self):
+        expire_before = time.time() - self.state_ttl
+        oauth_dir = os.path.join(self.directory, "oauth")
+        for name in os.listdir(oauth_dir):
+            path = os.path.join(oauth_dir, name)
+            try:
+                if os.path.getmtime(path) < expire_before:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
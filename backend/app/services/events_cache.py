@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta, timezone
+from difflib import SequenceMatcher, get_close_matches
+from typing import Callable, Dict, List, Optional, Set
+from app.config import (
+    EVENTS_CACHE_PAST_DAYS,
+    EVENTS_CACHE_FUTURE_DAYS,
+    EVENTS_CACHE_SYNC_INTERVAL,
+    EVENTS_CACHE_MATCH_THRESHOLD,
+)
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def parse_event_time(value: dict) -> datetime:
+    """Start/end of a Calendar API event as an aware datetime (all-day events start at midnight UTC)."""
+    if "dateTime" in value:
+        parsed = datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return datetime.strptime(value["date"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def title_tokens(text: str) -> Set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _share_of_words(words: Set[str], others: Set[str]) -> float:
+    """Fraction of ``words`` found in ``others``, counting close spellings ("appointments" ~ "appointment")."""
+    others = list(others)
+    found = sum(1 for word in words if get_close_matches(word, others, n=1, cutoff=0.8))
+    return found / len(words) if words else 0.0
+
+
+def title_score(name: str, title: str) -> float:
+    """How well an event title fits a looked-up name, 0 to 1.
+
+    The larger share of either side's words found in the other ("dentist
+    appointments" fully covers "Dentist"), or the spelling similarity of the
+    whole strings if that is higher.
+    """
+    query = name.lower().strip()
+    title = title.lower()
+    query_tokens, event_tokens = title_tokens(query), title_tokens(title)
+    overlap = max(_share_of_words(query_tokens, event_tokens), _share_of_words(event_tokens, query_tokens))
+    return max(overlap, SequenceMatcher(None, query, title).ratio())
+
+
+def title_matches(name: str, title: str, threshold: float = EVENTS_CACHE_MATCH_THRESHOLD) -> bool:
+    """Whether a title shares a word (or a close spelling of one) with ``name`` and scores at least ``threshold``."""
+    words = list(title_tokens(title))
+    shares_word = any(get_close_matches(token, words, n=1, cutoff=0.8) for token in title_tokens(name))
+    return shares_word and title_score(name, title) >= threshold
+
+
+def match_by_title(events: List[dict], name: str, threshold: float = EVENTS_CACHE_MATCH_THRESHOLD) -> List[dict]:
+    """Events whose title matches ``name``, best match first; empty when none does.
+
+    Used on every lookup path, so events listed straight from the API are
+    filtered exactly like those served by CalendarEventsCache.
+    """
+    matches = [event for event in events if title_matches(name, event.get("summary", ""), threshold)]
+    matches.sort(key=lambda event: -title_score(name, event.get("summary", "")))
+    return matches
+
+
+class CalendarEventsCache:
+    """Local mirror of one calendar's events inside a rolling time window.
+
+    The first sync lists the whole window; later syncs pass the ``syncToken``
+    from the previous one, so they only transfer events that changed since.
+    Syncs run at most once per ``sync_interval`` seconds unless the cache was
+    marked stale by a local write. A token index over event titles serves
+    fuzzy lookups by name without a server-side ``q`` search.
+
+    All methods block on the Calendar API and are meant to run on the
+    calendar worker threads.
+    """
+
+    def __init__(
+        self,
+        calendar_id: str = "primary",
+        past_days: int = EVENTS_CACHE_PAST_DAYS,
+        future_days: int = EVENTS_CACHE_FUTURE_DAYS,
+        sync_interval: float = EVENTS_CACHE_SYNC_INTERVAL,
+        match_threshold: float = EVENTS_CACHE_MATCH_THRESHOLD,
+    ):
+        self.calendar_id = calendar_id
+        self.past_days = past_days
+        self.future_days = future_days
+        self.sync_interval = sync_interval
+        self.match_threshold = match_threshold
+
+        self.events: Dict[str, dict] = {}
+        self.starts: Dict[str, datetime] = {}
+        self.title_index: Dict[str, Set[str]] = {}
+        self.sync_token: Optional[str] = None
+        self.window_start: Optional[datetime] = None
+        self.window_end: Optional[datetime] = None
+        self.last_sync = 0.0
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self._lock = threading.Lock()
+
+    def covers(self, time_min: datetime, time_max: datetime) -> bool:
+        """Whether a window starting from now would contain [time_min, time_max]."""
+        now = datetime.now(timezone.utc)
+        return (now - timedelta(days=self.past_days) <= time_min
+                and time_max <= now + timedelta(days=self.future_days))
+
+    def mark_stale(self):
+        self.last_sync = 0.0
+
+    def find(self, service, execute: Callable, time_min: datetime, time_max: datetime,
+             name: Optional[str] = None) -> List[dict]:
+        """Return events starting in [time_min, time_max] in start order.
+
+        With ``name`` only events whose title matches it are returned, best
+        match first, so a name that matches nothing gives an empty list.
+        """
+        with self._lock:
+            self._sync(service, execute, time_min, time_max)
+            in_range = [
+                self.events[event_id] for event_id, start in self.starts.items()
+                if time_min <= start <= time_max
+            ]
+            in_range.sort(key=lambda event: self.starts[event["id"]])
+            if not name:
+                return in_range
+
+            candidates = self._title_candidates(name)
+            return match_by_title([event for event in in_range if event["id"] in candidates], name,
+                                  self.match_threshold)
+
+    def stats(self) -> dict:
+        return {
+            "events": len(self.events),
+            "full_syncs": self.full_syncs,
+            "incremental_syncs": self.incremental_syncs,
+        }
+
+    def _title_candidates(self, name: str) -> Set[str]:
+        """Ids of events whose title shares a word, or a close spelling of one, with ``name``."""
+        ids = set()
+        for token in title_tokens(name):
+            for match in get_close_matches(token, self.title_index.keys(), n=5, cutoff=0.8):
+                ids |= self.title_index[match]
+        return ids
+
+    def _sync(self, service, execute: Callable, time_min: datetime, time_max: datetime):
+        window_ok = (self.window_start is not None
+                     and self.window_start <= time_min and time_max <= self.window_end)
+        if window_ok and time.monotonic() - self.last_sync < self.sync_interval:
+            return
+        if not window_ok or self.sync_token is None:
+            self._full_sync(service, execute)
+            return
+        from googleapiclient.errors import HttpError  # imported lazily, like the rest of googleapiclient
+
+        try:
+            self._incremental_sync(service, execute)
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            logger.info(f"Sync token for {self.calendar_id} expired, running a full sync")
+            self._full_sync(service, execute)
+
+    def _full_sync(self, service, execute: Callable):
+        now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.window_start = now - timedelta(days=self.past_days)
+        self.window_end = now + timedelta(days=self.future_days)
+        self.events, self.starts, self.title_index = {}, {}, {}
+
+        items, self.sync_token = self._list_all(service, execute, {
+            "timeMin": self.window_start.isoformat(),
+            "timeMax": self.window_end.isoformat(),
+        })
+        for event in items:
+            self._upsert(event)
+        self.full_syncs += 1
+        self.last_sync = time.monotonic()
+
+    def _incremental_sync(self, service, execute: Callable):
+        items, sync_token = self._list_all(service, execute, {"syncToken": self.sync_token})
+        for event in items:
+            if event.get("status") == "cancelled":
+                self._remove(event["id"])
+            else:
+                self._upsert(event)
+        self.sync_token = sync_token
+        self.incremental_syncs += 1
+        self.last_sync = time.monotonic()
+
+    def _list_all(self, service, execute: Callable, params: dict):
+        items, page_token = [], None
+        while True:
+            response = execute(service.events().list(
+                calendarId=self.calendar_id,
+                singleEvents=True,
+                maxResults=2500,
+                pageToken=page_token,
+                **params,
+            ))
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items, response.get("nextSyncToken")
+
+    def _upsert(self, event: dict):
+        self._remove(event["id"])
+        if "start" not in event:
+            return
+        start = parse_event_time(event["start"])
+        if not self.window_start <= start <= self.window_end:
+            return  # changes outside the mirrored window are not kept
+        self.events[event["id"]] = event
+        self.starts[event["id"]] = start
+        for token in title_tokens(event.get("summary", "")):
+            self.title_index.setdefault(token, set()).add(event["id"])
+
+    def _remove(self, event_id: str):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return
+        del self.starts[event_id]
+        for token in title_tokens(event.get("summary", "")):
+            ids = self.title_index.get(token)
+            if ids is not None:
+                ids.discard(event_id)
+                if not ids:
+                    del self.title_index[token]
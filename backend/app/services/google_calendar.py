@@ -1,10 +1,18 @@
-from datetime import datetime, timezone
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from itertools import islice
+import asyncio
+import json
 import os
-import pickle
+import threading
+import time
 import traceback
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google.auth.exceptions import RefreshError
 from fastapi import HTTPException, Request
 from fastapi.responses import HTMLResponse
 from app.config import (
@@ -12,43 +20,250 @@ from app.config import (
     GOOGLE_API_SCOPES, 
     API_HOST, 
     API_PORT,
-    OAUTH_REDIRECT_PATH
+    OAUTH_REDIRECT_PATH,
+    CALENDAR_MAX_WORKERS,
+    CALENDAR_CALL_TIMEOUT,
+    CALENDAR_SETTINGS_CACHE_TTL,
+    EVENTS_CACHE_ENABLED,
+    QUERY_MAX_EVENTS,
+    QUERY_PAGE_SIZE,
+    QUERY_MAX_RANGE_DAYS,
+    CONNECTED_CALENDARS,
+    CALENDAR_FANOUT_CONCURRENCY,
+    CALENDAR_FANOUT_TIMEOUT,
+    CALENDAR_BATCH_SIZE,
+    CALENDAR_CLIENT_CACHE_SIZE
 )
+from app.services.credential_store import CredentialStore
+from app.services.events_cache import CalendarEventsCache, match_by_title, parse_event_time, title_matches
+from app.utils.cache import TTLCache
+from app.utils.metrics import span
 import logging
 
 logger = logging.getLogger(__name__)
 
+# googleapiclient and google_auth_oauthlib are imported where they are used: they add
+# noticeably to startup and are only needed once a chat talks to its calendar.
+
+
+@lru_cache(maxsize=None)
+def calendar_discovery_document():
+    """Calendar v3 discovery document bundled with google-api-python-client, parsed once per process.
+
+    build_from_document fills in defaults on the document the first time each
+    resource is built. Doing that once here leaves the shared dict unchanged
+    afterwards, so worker threads can build clients from it concurrently.
+    """
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc('calendar', 'v3'))
+    warmup = build_from_document(document, http=httplib2.Http())
+    for resource in document.get('resources', {}):
+        getattr(warmup, resource)()
+    return document
+
+
+def build_calendar_client(credentials):
+    """Build a Calendar client offline from the cached discovery document."""
+    from googleapiclient.discovery import build_from_document
+
+    return build_from_document(calendar_discovery_document(), credentials=credentials)
+
+
+def resolve_time_range(query_params):
+    """Turn ``date``/``end_date``/``range`` query params into an inclusive UTC [time_min, time_max].
+
+    ``range`` may be ``"week"`` (Monday to Sunday around ``date``) or
+    ``"month"``; an explicit ``end_date`` wins over it. Raises ValueError on
+    malformed dates or an end before the start.
+    """
+    date_str = query_params.get('date') or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    start = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    span = query_params.get('range')
+    if query_params.get('end_date'):
+        end = datetime.strptime(query_params['end_date'], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    elif span == 'week':
+        start -= timedelta(days=start.weekday())
+        end = start + timedelta(days=6)
+    elif span == 'month':
+        start = start.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        end = start
+    if end < start:
+        raise ValueError("end_date is before date")
+    end = min(end, start + timedelta(days=QUERY_MAX_RANGE_DAYS))
+    return start, end.replace(hour=23, minute=59, second=59)
+
+
+def merge_calendar_events(results, ranked=False):
+    """Merge per-calendar event lists into (calendar_id, event) pairs sorted by start time.
+
+    With ``ranked`` (lookups by name, where each list comes best match first)
+    pairs are ordered by their rank within their calendar before start time,
+    so the best match of every calendar leads.
+    """
+    pairs = [
+        (rank, parse_event_time(event['start']), calendar_id, event)
+        for calendar_id, events in results.items()
+        for rank, event in enumerate(events)
+    ]
+    pairs.sort(key=lambda item: (item[0], item[1]) if ranked else item[1])
+    return [(calendar_id, event) for _, _, calendar_id, event in pairs]
+
+
+def events_result(pairs, failed_calendars=(), max_events=QUERY_MAX_EVENTS):
+    """Build the query_events response from merged (calendar_id, event) pairs.
+
+    One event past the cap is enough to know the listing is ``truncated``
+    without fetching the rest. Calendars that could not be queried are listed
+    in ``failed_calendars`` rather than failing the whole query.
+    """
+    failed_calendars = list(failed_calendars)
+    if not pairs:
+        message = 'No matching events found'
+        if failed_calendars:
+            message += f" (could not reach: {', '.join(failed_calendars)})"
+        return {'success': False, 'message': message, 'failed_calendars': failed_calendars}
+    return {
+        'success': True,
+        'truncated': len(pairs) > max_events,
+        'failed_calendars': failed_calendars,
+        'events': [
+            {
+                'id': event['id'],
+                'calendar_id': calendar_id,
+                'summary': event.get('summary', 'No Title'),
+                'start': event['start'].get('dateTime', event['start'].get('date')),
+                'end': event['end'].get('dateTime', event['end'].get('date')),
+                'participants': event.get('attendees', []),
+                'description': event.get('description', ''),
+                'link': event.get('htmlLink', ''),
+            }
+            for calendar_id, event in pairs[:max_events]
+        ]
+    }
+
+
+def bulk_update_data(events, event_data):
+    """The ``event_data`` to update each of several events with, in the same order.
+
+    The looked-up name is not a new title and the date is where the events
+    were found, so neither is applied. A new start or end time moves each
+    event on its own day, keeping its duration when only the start changes.
+    Raises ValueError when the change can't be applied to every event, such
+    as putting several events of one day into the same slot.
+    """
+    fields = {key: event_data[key] for key in ('description', 'location') if event_data.get(key)}
+    start_time, end_time = event_data.get('start_time'), event_data.get('end_time')
+    if not (start_time or end_time):
+        if not fields:
+            raise ValueError('there is nothing to change')
+        return [dict(fields) for _ in events]
+
+    changes, days = [], set()
+    for event in events:
+        if len(event['start']) == 10:
+            raise ValueError(f"{event['summary']} is an all-day event")
+        start, end = (datetime.fromisoformat(event[key].replace('Z', '+00:00')) for key in ('start', 'end'))
+        day = start.date().isoformat()
+        if day in days:
+            raise ValueError('some of them are on the same day and would end up at the same time')
+        days.add(day)
+        new_start = datetime.fromisoformat(f"{day}T{start_time}") if start_time else start.replace(tzinfo=None)
+        new_end = datetime.fromisoformat(f"{day}T{end_time}") if end_time else new_start + (end - start)
+        if new_end <= new_start or new_end.date() != new_start.date():
+            raise ValueError(f"{event['summary']} would not end after it starts on the same day")
+        changes.append({**fields, 'date': day, 'start_time': f"{new_start:%H:%M}", 'end_time': f"{new_end:%H:%M}"})
+    return changes
+
+
+class CalendarSession:
+    """One chat's Google credentials, its Calendar client and the caches tied to that account."""
+
+    def __init__(self, chat_id, credentials, service):
+        self.chat_id = chat_id
+        self.credentials = credentials
+        self.service = service
+        # httplib2 is not thread-safe, so each worker thread gets its own authorized Http
+        self._local = threading.local()
+        # Timezone, calendar list and other settings rarely change; avoid a round-trip per message
+        self.settings_cache = TTLCache(ttl=CALENDAR_SETTINGS_CACHE_TTL)
+        # calendar_id -> local mirror of its events, kept current with sync tokens
+        self.events_caches = {}
+        self._events_caches_lock = threading.Lock()
+
+    def execute(self, request):
+        """Execute a googleapiclient request on the calling thread's Http."""
+        if self.credentials is None:
+            return request.execute()
+        if getattr(self._local, "http", None) is None:
+            self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return request.execute(http=self._local.http)
+
+    def get_events_cache(self, calendar_id):
+        """Return the events mirror of a calendar, or None if the events cache is disabled."""
+        if not EVENTS_CACHE_ENABLED:
+            return None
+        with self._events_caches_lock:
+            if calendar_id not in self.events_caches:
+                self.events_caches[calendar_id] = CalendarEventsCache(calendar_id)
+            return self.events_caches[calendar_id]
+
+
 class GoogleCalendarService:
-    def __init__(self):
-        self.credentials = None
-        self.token_path = '/data/token.pickle'
-        self.service = None
+    """Google Calendar access for every chat, each with its own Google account.
+
+    Credentials live encrypted in a CredentialStore, one entry per chat.
+    ``calendar_ids`` (CONNECTED_CALENDARS) is resolved for each chat against
+    that account's calendar list, see ``calendar_ids_for``.
+    Building a Calendar client is expensive, so the sessions of the
+    ``max_clients`` most recently active chats are kept in memory and reused.
+    """
+
+    def __init__(self, calendar_ids=None, store: CredentialStore = None,
+                 max_clients: int = CALENDAR_CLIENT_CACHE_SIZE):
+        self.calendar_ids = list(calendar_ids or CONNECTED_CALENDARS)
         self.redirect_uri = os.getenv("BACKEND_URL", f"http://{API_HOST}:{API_PORT}") + OAUTH_REDIRECT_PATH
-    
-    def get_auth_url(self):
+        self.max_clients = max_clients
+        self.client_builds = 0
+        self._store = store
+        # chat_id -> CalendarSession, least recently used first
+        self.sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        # chat_id -> access token expiry (naive UTC, like google-auth) and last time the chat used it
+        self.token_expiry = {}
+        self.last_used = {}
+        self._refresh_locks = {}
+
+    @property
+    def store(self):
+        # Created on first use, so importing the service does not touch the credentials directory
+        with self._sessions_lock:
+            if self._store is None:
+                self._store = CredentialStore()
+            return self._store
+
+    def get_auth_url(self, chat_id):
+        from google_auth_oauthlib.flow import Flow
+
         flow = Flow.from_client_secrets_file(
             GOOGLE_CLIENT_SECRET_FILE,
             scopes=GOOGLE_API_SCOPES,
             redirect_uri=self.redirect_uri
         )
-        print("Redirect URI:", flow.redirect_uri)
         auth_url, state = flow.authorization_url(
             access_type='offline',
             include_granted_scopes='true',
             prompt='consent'
         )
 
-        # Store only the state
-        with open("oauth_state.txt", "w") as f:
-            f.write(state)
-
-        # store client_config and redirect_uri to use in the callback function.
-        with open("client_config.pickle", "wb") as f:
-            pickle.dump({"client_secrets_file": GOOGLE_CLIENT_SECRET_FILE, "scopes": GOOGLE_API_SCOPES, "redirect_uri": self.redirect_uri}, f)
-
+        # Keyed by the flow's state, so sign-ins from several chats at once don't overwrite each other
+        self.store.save_flow(state, chat_id, flow.code_verifier, self.redirect_uri)
         return auth_url
 
-    async def handle_oauth_callback(self, request: Request):
+    def handle_oauth_callback(self, request: Request):
         """Handle the OAuth callback and exchange code for token"""
         code = request.query_params.get('code')
         state = request.query_params.get('state')
@@ -58,32 +273,29 @@ class GoogleCalendarService:
             raise HTTPException(status_code=400, detail="Missing code or state")
 
         try:
-            with open('oauth_state.txt', 'r') as f:
-                saved_state = f.read()
-            with open('client_config.pickle', 'rb') as f:
-                client_config = pickle.load(f)
+            flow_data = self.store.pop_flow(state)
+        except ValueError:
+            flow_data = None
+        if flow_data is None:
+            logger.error("Unknown or expired state parameter in OAuth callback")
+            raise HTTPException(status_code=400, detail="Invalid or expired state parameter")
 
-        except FileNotFoundError as e:
-            logger.error(f"Authentication flow expired: {e}")
-            logger.error(traceback.format_exc())
-            raise HTTPException(status_code=500, detail="Authentication flow expired")
+        from google_auth_oauthlib.flow import Flow
 
-        if state != saved_state:
-            logger.error("Invalid state parameter in OAuth callback")
-            raise HTTPException(status_code=400, detail="Invalid state parameter")
         try:
             flow = Flow.from_client_secrets_file(
-                client_config["client_secrets_file"],
-                scopes=client_config["scopes"],
-                redirect_uri=client_config["redirect_uri"]
+                GOOGLE_CLIENT_SECRET_FILE,
+                scopes=GOOGLE_API_SCOPES,
+                redirect_uri=flow_data["redirect_uri"],
+                code_verifier=flow_data["code_verifier"]
             )
             flow.fetch_token(code=code)
-            self.credentials = flow.credentials
-
-            with open(self.token_path, 'wb') as token:
-                pickle.dump(self.credentials, token)
-
-            self.service = build('calendar', 'v3', credentials=self.credentials)
+            chat_id = flow_data["chat_id"]
+            self.store.save(chat_id, flow.credentials)
+            self.token_expiry[chat_id] = flow.credentials.expiry
+            self.last_used[chat_id] = time.time()
+            # Replaces any session of a previous account, along with its caches
+            self.open_session(chat_id, flow.credentials)
             html_content = """
                 <!DOCTYPE html>
                 <html>
@@ -128,79 +340,220 @@ class GoogleCalendarService:
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail="Failed to authenticate")
 
-    def get_calendar_service(self):
-        """Get an authenticated Google Calendar service."""
-        if self.service:
-            logger.info("✅ Using existing service instance.")
-            return self.service
+    def open_session(self, chat_id, credentials, service=None):
+        """Build (unless given) a Calendar client for ``credentials`` and cache it as the chat's session."""
+        if service is None:
+            service = build_calendar_client(credentials)
+            self.client_builds += 1
+        session = CalendarSession(chat_id, credentials, service)
+        with self._sessions_lock:
+            self.sessions[chat_id] = session
+            self.sessions.move_to_end(chat_id)
+            while len(self.sessions) > self.max_clients:
+                self.sessions.popitem(last=False)
+        return session
 
-        # Load existing credentials if available
-        if os.path.exists(self.token_path):
-            try:
-                with open(self.token_path, 'rb') as token:
-                    self.credentials = pickle.load(token)
-            except Exception as e:
-                logger.info(f"⚠️ Error loading credentials: {e}")
-                if os.path.exists(self.token_path): 
-                    os.remove(self.token_path)
-                return None  # Force re-authentication
-
-        # If credentials are valid, use them
-        if self.credentials and self.credentials.valid:
-            logger.info("✅ Loaded valid credentials.")
-            self.service = build('calendar', 'v3', credentials=self.credentials)
-            return self.service
-
-        # If credentials are expired but refreshable, refresh them
-        if self.credentials and self.credentials.expired and self.credentials.refresh_token:
+    def peek_session(self, chat_id):
+        """Return the chat's session if it is cached, without touching the store or the network."""
+        with self._sessions_lock:
+            return self.sessions.get(chat_id)
+
+    def get_session(self, chat_id):
+        """Return the chat's session, loading its credentials from the store if it is not cached."""
+        self.last_used[chat_id] = time.time()
+        with self._sessions_lock:
+            session = self.sessions.get(chat_id)
+            if session is not None:
+                self.sessions.move_to_end(chat_id)
+                return session
+
+        credentials = self.store.load(chat_id)
+        if credentials is None:
+            return None
+
+        # Normally the TokenRefresher renews tokens before they expire; this only
+        # happens for chats it was not keeping warm
+        if not credentials.valid:
+            if not (credentials.expired and credentials.refresh_token):
+                logger.info(f"⚠️ No valid credentials for chat {chat_id}. User must reauthenticate.")
+                return None
             try:
-                logger.info("🔄 Refreshing expired credentials...")
-                self.credentials.refresh(Request())
-                with open(self.token_path, 'wb') as token:
-                    pickle.dump(self.credentials, token)
-                logger.info("✅ Credentials refreshed successfully.")
-                self.service = build('calendar', 'v3', credentials=self.credentials)
-                return self.service
+                credentials = self.refresh_credentials(chat_id)
+            except RefreshError as e:
+                logger.info(f"❌ Failed to refresh credentials for chat {chat_id}: {e}")
+                self.forget_credentials(chat_id)  # Remove revoked credentials
+                return None
             except Exception as e:
-                logger.info(f"❌ Failed to refresh credentials: {e}")
-                if os.path.exists(self.token_path):
-                    os.remove(self.token_path)  # Remove invalid credentials
+                logger.info(f"❌ Failed to refresh credentials for chat {chat_id}: {e}")
+                return None
+            if credentials is None:
                 return None
 
-        # If no valid credentials are found, require authentication
-        logger.info("⚠️ No valid credentials found. User must reauthenticate.")
-        return None
-    
-    def is_authenticated(self):
-        """Check if the user is authenticated"""
-        return self.get_calendar_service() is not None
-    
+        self.token_expiry[chat_id] = credentials.expiry
+        return self.open_session(chat_id, credentials)
 
-    def get_user_timezone(self):
-        """Fetch the user's time zone from Google Calendar settings."""
-        service = self.get_calendar_service()
-        if not service:
-            return 'UTC'  # Default to UTC if authentication fails
+    def refresh_credentials(self, chat_id, margin=0):
+        """Renew the chat's access token unless it stays valid for another ``margin`` seconds.
+
+        Single-flight per chat: a caller that arrives while a refresh is in
+        progress waits for it and then finds the token fresh. The renewed token
+        is written back to the store (atomically) and picked up by the chat's
+        cached session, which shares the credentials object. Raises
+        RefreshError if Google rejects the refresh token.
+        """
+        with self._sessions_lock:
+            lock = self._refresh_locks.setdefault(chat_id, threading.Lock())
+        with lock:
+            session = self.peek_session(chat_id)
+            credentials = session.credentials if session else self.store.load(chat_id)
+            if credentials is None or not credentials.refresh_token:
+                self.token_expiry.pop(chat_id, None)
+                return None
+            if credentials.expiry is not None and self._seconds_left(credentials.expiry) > margin:
+                return credentials  # refreshed by whoever held the lock before us
+
+            from google.auth.transport.requests import Request as GoogleAuthRequest
+
+            logger.info(f"🔄 Refreshing credentials for chat {chat_id}...")
+            credentials.refresh(GoogleAuthRequest())
+            self.store.save(chat_id, credentials)
+            self.token_expiry[chat_id] = credentials.expiry
+            return credentials
+
+    @staticmethod
+    def _seconds_left(expiry):
+        return (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    def forget_credentials(self, chat_id):
+        """Drop a chat's stored credentials and session, e.g. after Google revoked them."""
+        self.store.delete(chat_id)
+        with self._sessions_lock:
+            self.sessions.pop(chat_id, None)
+        self.token_expiry.pop(chat_id, None)
+
+    def index_stored_tokens(self):
+        """Record the expiry of every stored token, so tokens saved before a restart are kept warm too."""
+        now = time.time()
+        for chat_id in list(self.store.chat_ids()):
+            credentials = self.store.load(chat_id)
+            if credentials is not None and credentials.refresh_token:
+                self.token_expiry[chat_id] = credentials.expiry
+                self.last_used.setdefault(chat_id, now)
+
+    def tokens_due(self, margin, idle_ttl):
+        """Chats used within ``idle_ttl`` seconds whose token expires within ``margin`` seconds."""
+        active_since = time.time() - idle_ttl
+        return [
+            chat_id for chat_id, expiry in list(self.token_expiry.items())
+            if expiry is not None and self._seconds_left(expiry) <= margin
+            and self.last_used.get(chat_id, 0) >= active_since
+        ]
+
+    def get_calendar_service(self, chat_id):
+        """Get an authenticated Google Calendar service for a chat."""
+        session = self.get_session(chat_id)
+        return session.service if session else None
 
+    def _require_session(self, chat_id):
+        session = self.get_session(chat_id)
+        if session is None:
+            raise PermissionError(f"Chat {chat_id} is not authenticated")
+        return session
+
+    def is_authenticated(self, chat_id):
+        """Check if the chat has a connected Google account"""
+        return self.get_session(chat_id) is not None
+
+    def invalidate_settings(self, chat_id, setting=None):
+        """Drop the chat's cached settings (all of them if no setting name is given)."""
+        session = self.peek_session(chat_id)
+        if session is None:
+            return
+        if setting is None:
+            session.settings_cache.invalidate()
+        else:
+            session.settings_cache.invalidate(f"setting:{setting}")
+
+    def get_events_cache(self, chat_id, calendar_id):
+        """Return the events mirror of one of the chat's calendars, or None if disabled or unauthenticated."""
+        session = self.get_session(chat_id)
+        return session.get_events_cache(calendar_id) if session else None
+
+    def invalidate_events(self, chat_id, calendar_id='primary'):
+        """Make the next lookup sync the calendar's events mirror, e.g. after a local write."""
+        session = self.peek_session(chat_id)
+        events_cache = session.events_caches.get(calendar_id) if session else None
+        if events_cache is not None:
+            events_cache.mark_stale()
+
+    def get_setting(self, chat_id, setting):
+        """Fetch a Google Calendar user setting, served from the settings cache when fresh."""
+        session = self.get_session(chat_id)
+        if not session:
+            return None
+
+        cached = session.settings_cache.get(f"setting:{setting}")
+        if cached is not None:
+            return cached
+
+        value = session.execute(session.service.settings().get(setting=setting)).get('value')
+        if value is not None:
+            session.settings_cache.set(f"setting:{setting}", value)
+        return value
+
+    def cache_stats(self):
+        """Settings and events cache counters summed over the cached sessions."""
+        with self._sessions_lock:
+            sessions = list(self.sessions.values())
+        hits = sum(session.settings_cache.hits for session in sessions)
+        misses = sum(session.settings_cache.misses for session in sessions)
+        events_caches = [cache for session in sessions for cache in list(session.events_caches.values())]
+        return {
+            "sessions": len(sessions),
+            "client_builds": self.client_builds,
+            "settings_hits": hits,
+            "settings_misses": misses,
+            "settings_hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "events_full_syncs": sum(cache.full_syncs for cache in events_caches),
+            "events_incremental_syncs": sum(cache.incremental_syncs for cache in events_caches),
+        }
+
+    def get_user_timezone(self, chat_id):
+        """Fetch the user's time zone from Google Calendar settings."""
         try:
-            settings = service.settings().get(setting='timezone').execute()
-            return settings.get('value', 'UTC')
+            return self.get_setting(chat_id, 'timezone') or 'UTC'  # Default to UTC if authentication fails
         except Exception as e:
             logger.info(f"⚠️ Failed to retrieve user time zone: {e}")
             return 'UTC'
     
-    def create_event(self, event_data):
+    def create_event(self, chat_id, event_data):
         """Create a new event in Google Calendar"""
-        service = self.get_calendar_service()
-        if not service:
+        session = self.get_session(chat_id)
+        if not session:
             return {
                 'success': False,
                 'message': 'Authentication required',
                 'auth_required': True
             }
-        
-        # Get user's time zone
-        user_timezone = self.get_user_timezone()
+
+        try:
+            event = self._event_body(event_data, self.get_user_timezone(chat_id))
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+
+        logger.debug("Creating event with data: %s", event)
+        created_event = session.execute(session.service.events().insert(calendarId='primary', body=event))
+        self.invalidate_events(chat_id, 'primary')
+        return {
+            'success': True,
+            'event_id': created_event['id'],
+            'event_link': created_event['htmlLink'],
+            'event': created_event,
+        }
+
+    @staticmethod
+    def _event_body(event_data, user_timezone):
+        """Build an insert body from extracted event details; raises ValueError if the times are unusable."""
         start_time = event_data.get('start_time')
         end_time = event_data.get('end_time')
         date = event_data.get('date')
@@ -209,97 +562,158 @@ class GoogleCalendarService:
         if start_time and not end_time:
             try:
                 start_dt = datetime.strptime(f"{date}T{start_time}", "%Y-%m-%dT%H:%M")
-                end_dt = start_dt + timedelta(minutes=30)
-                end_time = end_dt.strftime("%H:%M")
-            except Exception as e:
-                return {
-                    'success': False,
-                    'message': f'Invalid start time or date: {e}'
-                }
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'Invalid start time or date: {e}')
+            end_time = (start_dt + timedelta(minutes=30)).strftime("%H:%M")
 
         if not start_time or not end_time:
-            return {
-                'success': False,
-                'message': 'Start time and end time are required.'
-            }        
+            raise ValueError('Start time and end time are required.')
+
         event = {
-            'summary': event_data.get('event_name', 'Untitled Event'),
-            'description': event_data.get('description', ''),
+            'summary': event_data.get('event_name') or 'Untitled Event',
+            'description': event_data.get('description') or '',
             'start': {
-                'dateTime': f"{event_data.get('date')}T{event_data.get('start_time')}:00",
+                'dateTime': f"{date}T{start_time}:00",
                 'timeZone': user_timezone,
             },
             'end': {
-                'dateTime': f"{event_data.get('date')}T{event_data.get('end_time')}:00",
+                'dateTime': f"{date}T{end_time}:00",
                 'timeZone': user_timezone,
             },
         }
-        
+        if event_data.get('location'):
+            event['location'] = event_data['location']
+
         # Add attendees if specified
         if event_data.get('participants'):
             event['attendees'] = [
                 {'email': participant} for participant in event_data.get('participants')
                 if '@' in participant  # Simple email validation
             ]
-        logger.info(f"Creating event with data: {event}")
-        created_event = service.events().insert(calendarId='primary', body=event).execute()
-        return {
-            'success': True,
-            'event_id': created_event['id'],
-            'event_link': created_event['htmlLink']
-        }
-    
-    def update_event(self, event_id, event_data):
+        return event
+
+    @staticmethod
+    def _patch_body(event_data, user_timezone):
+        """Build a patch body holding only the fields the user asked to change."""
+        body = {}
+        if event_data.get('event_name'):
+            body['summary'] = event_data['event_name']
+        if event_data.get('description'):
+            body['description'] = event_data['description']
+        if event_data.get('location'):
+            body['location'] = event_data['location']
+        if event_data.get('date') and event_data.get('start_time'):
+            body['start'] = {'dateTime': f"{event_data['date']}T{event_data['start_time']}:00", 'timeZone': user_timezone}
+        if event_data.get('date') and event_data.get('end_time'):
+            body['end'] = {'dateTime': f"{event_data['date']}T{event_data['end_time']}:00", 'timeZone': user_timezone}
+        return body
+
+    def update_event(self, chat_id, event_id, event_data, calendar_id='primary'):
         """Update an existing event in Google Calendar"""
-        service = self.get_calendar_service()
-        if not service:
+        session = self.get_session(chat_id)
+        if not session:
             return {
                 'success': False,
                 'message': 'Authentication required',
                 'auth_required': True
             }
-            
-        # First retrieve the event
-        event = service.events().get(calendarId='primary', eventId=event_id).execute()
-        
-        # Update fields
-        if 'event_name' in event_data:
-            event['summary'] = event_data['event_name']
-        if 'description' in event_data:
-            event['description'] = event_data['description']
-        if 'date' in event_data and 'start_time' in event_data:
-            event['start']['dateTime'] = f"{event_data['date']}T{event_data['start_time']}:00"
-        if 'date' in event_data and 'end_time' in event_data:
-            event['end']['dateTime'] = f"{event_data['date']}T{event_data['end_time']}:00"
-            
-        logger.info(f"Updating event {event_id} with data: {event}")
-        updated_event = service.events().update(
-            calendarId='primary', eventId=event_id, body=event).execute()
-            
+
+        # patch only sends the changed fields, so the event does not have to be fetched first
+        body = self._patch_body(event_data, self.get_user_timezone(chat_id))
+        logger.debug("Updating event %s with data: %s", event_id, body)
+        updated_event = session.execute(session.service.events().patch(
+            calendarId=calendar_id, eventId=event_id, body=body))
+        self.invalidate_events(chat_id, calendar_id)
+
         return {
             'success': True,
             'event_id': updated_event['id'],
-            'event_link': updated_event['htmlLink']
+            'event_link': updated_event['htmlLink'],
+            'event': updated_event,
         }
-    
-    def delete_event(self, event_id):
+
+    def delete_event(self, chat_id, event_id, calendar_id='primary'):
         """Delete an event from Google Calendar"""
-        service = self.get_calendar_service()
-        if not service:
+        session = self.get_session(chat_id)
+        if not session:
             return {
                 'success': False,
                 'message': 'Authentication required',
                 'auth_required': True
             }
             
-        service.events().delete(calendarId='primary', eventId=event_id).execute()
+        session.execute(session.service.events().delete(calendarId=calendar_id, eventId=event_id))
+        self.invalidate_events(chat_id, calendar_id)
         return {'success': True, 'message': 'Event deleted successfully'}
+
+    def batch_mutate(self, chat_id, operations):
+        """Apply several creates, updates and deletes in as few HTTP round-trips as possible.
+
+        Each operation is a dict with ``action`` (``create``, ``update`` or
+        ``delete``), ``calendar_id`` (default primary), ``event_id`` for
+        updates and deletes and ``event_data`` for creates and updates. The
+        requests go out through the batch endpoint, ``CALENDAR_BATCH_SIZE`` per
+        HTTP request. Returns one result dict per operation, in order; a
+        failing operation does not affect the others.
+        """
+        session = self.get_session(chat_id)
+        if not session:
+            return [{'success': False, 'message': 'Authentication required', 'auth_required': True}
+                    for _ in operations]
+
+        service = session.service
+        user_timezone = self.get_user_timezone(chat_id)
+        results = [None] * len(operations)
+        requests = []
+        for index, operation in enumerate(operations):
+            calendar_id = operation.get('calendar_id', 'primary')
+            action = operation['action']
+            try:
+                if action == 'create':
+                    request = service.events().insert(
+                        calendarId=calendar_id, body=self._event_body(operation['event_data'], user_timezone))
+                elif action == 'update':
+                    request = service.events().patch(
+                        calendarId=calendar_id, eventId=operation['event_id'],
+                        body=self._patch_body(operation['event_data'], user_timezone))
+                elif action == 'delete':
+                    request = service.events().delete(calendarId=calendar_id, eventId=operation['event_id'])
+                else:
+                    raise ValueError(f'Unknown action: {action}')
+            except (KeyError, ValueError) as e:
+                results[index] = {'success': False, 'message': str(e)}
+                continue
+            requests.append((index, request))
+
+        def callback(request_id, response, exception):
+            index = int(request_id)
+            if exception is not None:
+                results[index] = {'success': False, 'message': str(exception)}
+            elif operations[index]['action'] == 'delete':
+                results[index] = {'success': True, 'event_id': operations[index]['event_id']}
+            else:
+                results[index] = {'success': True, 'event_id': response['id'], 'event_link': response.get('htmlLink')}
+
+        for offset in range(0, len(requests), CALENDAR_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for index, request in requests[offset:offset + CALENDAR_BATCH_SIZE]:
+                batch.add(request, request_id=str(index))
+            try:
+                session.execute(batch)
+            except Exception as e:
+                logger.error(f"Batch request failed: {e}")
+                for index, _ in requests[offset:offset + CALENDAR_BATCH_SIZE]:
+                    if results[index] is None:
+                        results[index] = {'success': False, 'message': f'Internal error: {e}'}
+
+        for calendar_id in {operation.get('calendar_id', 'primary') for operation in operations}:
+            self.invalidate_events(chat_id, calendar_id)
+        return results
     
-    def query_events(self, query_params):
-        """Query events based on parameters"""
+    def query_events(self, chat_id, query_params):
+        """Query events based on parameters, one connected calendar after another"""
         try:
-            service = self.get_calendar_service()
-            if not service:
+            if not self.is_authenticated(chat_id):
                 logger.error("No authenticated Google Calendar service found.")
                 return {
                     'success': False,
@@ -307,49 +721,24 @@ class GoogleCalendarService:
                     'auth_required': True
                 }
             
-            date_str = query_params.get('date')  
-            if date_str:  
-                try:
-                    date_obj = datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=timezone.utc)
-                    time_min = date_obj.isoformat()  # Start of day
-                    time_max = date_obj.replace(hour=23, minute=59, second=59).isoformat()  # End of day
-                except ValueError:
-                    return {'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD'}
-
+            try:
+                time_min, time_max = resolve_time_range(query_params)
+            except ValueError:
+                return {'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD'}
 
             query_text = query_params.get('event_name')
             # logger.info(f"Querying events with time: {time_min} to {time_max}")
 
-            request = service.events().list(
-                calendarId='primary',
-                timeMin=time_min if time_min else None,
-                timeMax=time_max if time_max else None,
-                # q=query_text if query_text else None,
-                singleEvents=True,
-                orderBy='startTime'
-            )
-
-            events_result = request.execute()
-            events = events_result.get('items', [])
-            
-            if not events:
-                return {'success': False, 'message': 'No matching events found'}
+            results, failed = {}, []
+            for calendar_id in self.calendar_ids_for(chat_id):
+                try:
+                    results[calendar_id] = self.list_calendar_events(
+                        chat_id, calendar_id, time_min, time_max, query_text)
+                except Exception as e:
+                    logger.error(f"Failed to query calendar {calendar_id}: {e}")
+                    failed.append(calendar_id)
 
-            return {
-                'success': True,
-                'events': [
-                    {
-                        'id': event['id'],
-                        'summary': event.get('summary', 'No Title'),
-                        'start': event['start'].get('dateTime', event['start'].get('date')),
-                        'end': event['end'].get('dateTime', event['end'].get('date')),
-                        'participants': event.get('attendees', []),
-                        'description': event.get('description', ''),
-                        'link': event.get('htmlLink', ''),
-                    }
-                    for event in events
-                ]
-            }
+            return events_result(merge_calendar_events(results, ranked=bool(query_text)), failed)
         except Exception as e:
             logger.error(f"Exception in query_events: {e}")
             logger.error(traceback.format_exc())
@@ -358,10 +747,213 @@ class GoogleCalendarService:
                 'message': f'Internal error: {e}'
             }
 
-    def list_calendars(self):
+    def list_calendar_events(self, chat_id, calendar_id, time_min, time_max, name=None,
+                             limit=QUERY_MAX_EVENTS + 1):
+        """Raw events of one calendar in [time_min, time_max], at most ``limit`` of them.
+
+        With ``name`` only events whose title matches it are returned, best match first.
+        """
+        session = self._require_session(chat_id)
+        events_cache = session.get_events_cache(calendar_id)
+        if events_cache is not None and events_cache.covers(time_min, time_max):
+            # Served from the local mirror, kept current by an incremental sync
+            return events_cache.find(session.service, session.execute, time_min, time_max, name)[:limit]
+        events = self.iter_events(chat_id, time_min, time_max, calendar_id)
+        if not name:
+            return list(islice(events, limit))
+        # Titles are matched here the same way the cache matches them
+        matching = (event for event in events if title_matches(name, event.get('summary', '')))
+        return match_by_title(list(islice(matching, limit)), name)
+
+    def list_events_page(self, chat_id, calendar_id, time_min, time_max, page_token=None):
+        """Fetch one page of events in [time_min, time_max]; returns (items, next page token)."""
+        session = self._require_session(chat_id)
+        response = session.execute(session.service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            singleEvents=True,
+            orderBy='startTime',
+            maxResults=QUERY_PAGE_SIZE,
+            pageToken=page_token
+        ))
+        return response.get('items', []), response.get('nextPageToken')
+
+    def iter_events(self, chat_id, time_min, time_max, calendar_id='primary'):
+        """Yield events in start order, fetching the next page only when the caller gets there."""
+        page_token = None
+        while True:
+            items, page_token = self.list_events_page(chat_id, calendar_id, time_min, time_max, page_token)
+            yield from items
+            if not page_token:
+                return
+
+    def calendar_ids_for(self, chat_id):
+        """The calendars to query for a chat, from ``calendar_ids`` and the chat's own (cached) calendar list."""
+        if self.calendar_ids == ['primary']:
+            return ['primary']  # every account has one; no calendar list needed
+        try:
+            calendars = self.list_calendars(chat_id)
+        except Exception as e:
+            logger.error(f"Failed to list calendars for chat {chat_id}: {e}")
+            return ['primary']
+        if not isinstance(calendars, list):
+            return ['primary']
+
+        visible = {calendar['id'] for calendar in calendars}
+        ids = []
+        for calendar_id in self.calendar_ids:
+            if calendar_id == 'selected':
+                ids += ['primary' if calendar.get('primary') else calendar['id']
+                        for calendar in calendars if calendar.get('selected')]
+            elif calendar_id == 'primary' or calendar_id in visible:
+                ids.append(calendar_id)
+        return list(dict.fromkeys(ids)) or ['primary']
+
+    def list_calendars(self, chat_id):
         """Check if authentication works by listing calendars"""
-        if not self.is_authenticated():
+        session = self.get_session(chat_id)
+        if not session:
             return "You are not authenticated. Please log in."
 
-        calendars = self.service.calendarList().list().execute()
-        return calendars.get("items", [])
+        cached = session.settings_cache.get("calendar_list")
+        if cached is not None:
+            return cached
+
+        calendars = session.execute(session.service.calendarList().list()).get("items", [])
+        session.settings_cache.set("calendar_list", calendars)
+        return calendars
+
+
+
+class AsyncGoogleCalendarService:
+    """Async facade that runs GoogleCalendarService calls on a bounded thread pool.
+
+    googleapiclient only offers blocking ``execute()`` calls, so running them
+    directly in a request handler stalls the event loop for every other chat.
+    At most ``max_workers`` Calendar calls run at once; further calls wait for
+    a free worker without blocking the loop.
+    """
+
+    def __init__(self, calendar_service: GoogleCalendarService = None,
+                 max_workers: int = CALENDAR_MAX_WORKERS, timeout: float = CALENDAR_CALL_TIMEOUT,
+                 fanout_concurrency: int = CALENDAR_FANOUT_CONCURRENCY,
+                 calendar_timeout: float = CALENDAR_FANOUT_TIMEOUT):
+        self.sync = calendar_service or GoogleCalendarService()
+        self.timeout = timeout
+        self.fanout_concurrency = fanout_concurrency
+        self.calendar_timeout = calendar_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calendar")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        with span("calendar"):
+            future = loop.run_in_executor(self._executor, partial(func, *args))
+            return await asyncio.wait_for(future, timeout=self.timeout)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    async def get_auth_url(self, chat_id):
+        return await self._run(self.sync.get_auth_url, chat_id)
+
+    async def handle_oauth_callback(self, request: Request):
+        return await self._run(self.sync.handle_oauth_callback, request)
+
+    async def is_authenticated(self, chat_id):
+        return await self._run(self.sync.is_authenticated, chat_id)
+
+    async def refresh_credentials(self, chat_id, margin=0):
+        return await self._run(self.sync.refresh_credentials, chat_id, margin)
+
+    async def index_stored_tokens(self):
+        return await self._run(self.sync.index_stored_tokens)
+
+    async def get_user_timezone(self, chat_id):
+        return await self._run(self.sync.get_user_timezone, chat_id)
+
+    async def create_event(self, chat_id, event_data):
+        return await self._run(self.sync.create_event, chat_id, event_data)
+
+    async def update_event(self, chat_id, event_id, event_data, calendar_id='primary'):
+        return await self._run(self.sync.update_event, chat_id, event_id, event_data, calendar_id)
+
+    async def delete_event(self, chat_id, event_id, calendar_id='primary'):
+        return await self._run(self.sync.delete_event, chat_id, event_id, calendar_id)
+
+    async def batch_mutate(self, chat_id, operations):
+        return await self._run(self.sync.batch_mutate, chat_id, operations)
+
+    async def iter_events(self, chat_id, time_min, time_max, calendar_id='primary'):
+        """Async counterpart of GoogleCalendarService.iter_events; each page is fetched on a worker."""
+        page_token = None
+        while True:
+            items, page_token = await self._run(
+                self.sync.list_events_page, chat_id, calendar_id, time_min, time_max, page_token
+            )
+            for item in items:
+                yield item
+            if not page_token:
+                return
+
+    async def query_events(self, chat_id, query_params):
+        """Query every connected calendar concurrently and merge the results by start time.
+
+        At most ``fanout_concurrency`` calendars are queried at once and each
+        gets ``calendar_timeout`` seconds; calendars that fail or time out are
+        reported in ``failed_calendars``.
+        """
+        try:
+            time_min, time_max = resolve_time_range(query_params)
+        except ValueError:
+            return {'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD'}
+        if not await self.is_authenticated(chat_id):
+            return {'success': False, 'message': 'Authentication required', 'auth_required': True}
+
+        name = query_params.get('event_name')
+        semaphore = asyncio.Semaphore(self.fanout_concurrency)
+
+        async def query_one(calendar_id):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self._list_calendar_events(chat_id, calendar_id, time_min, time_max, name),
+                    timeout=self.calendar_timeout,
+                )
+
+        calendar_ids = await self._run(self.sync.calendar_ids_for, chat_id)
+        outcomes = await asyncio.gather(*(query_one(calendar_id) for calendar_id in calendar_ids),
+                                        return_exceptions=True)
+        results, failed = {}, []
+        for calendar_id, outcome in zip(calendar_ids, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Failed to query calendar {calendar_id}: {outcome!r}")
+                failed.append(calendar_id)
+            else:
+                results[calendar_id] = outcome
+        return events_result(merge_calendar_events(results, ranked=bool(name)), failed)
+
+    async def _list_calendar_events(self, chat_id, calendar_id, time_min, time_max, name=None):
+        session = self.sync.peek_session(chat_id)
+        events_cache = session.get_events_cache(calendar_id) if session else None
+        if events_cache is not None and events_cache.covers(time_min, time_max):
+            return await self._run(self.sync.list_calendar_events, chat_id, calendar_id, time_min, time_max, name)
+
+        # Walk pages lazily and stop once past the cap, so a busy calendar is never listed in full
+        events = []
+        async with aclosing(self.iter_events(chat_id, time_min, time_max, calendar_id)) as pages:
+            async for event in pages:
+                if name and not title_matches(name, event.get('summary', '')):
+                    continue  # filtered like the cache does, so both paths give the same answer
+                events.append(event)
+                if len(events) > QUERY_MAX_EVENTS:
+                    break
+        return match_by_title(events, name) if name else events
+
+    async def list_calendars(self, chat_id):
+        return await self._run(self.sync.list_calendars, chat_id)
+
+    def invalidate_settings(self, chat_id, setting=None):
+        self.sync.invalidate_settings(chat_id, setting)
+
+    def cache_stats(self):
+        return self.sync.cache_stats()
@@ -0,0 +1,104 @@
+from typing import Dict, List
+from app.config import (
+    HISTORY_TOKEN_BUDGET,
+    HISTORY_SUMMARY_CACHE_SIZE,
+    HISTORY_SUMMARY_BATCH_TURNS,
+    CONVERSATION_IDLE_TTL,
+)
+from app.prompts.history_summary_prompt import HISTORY_SUMMARY_PROMPT
+from app.services.conversation import Message
+from app.utils.cache import TTLCache
+from app.utils.helpers import estimate_tokens, format_conversation_history
+from app.services.ai_service import model_router
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor:
+    """Keep the conversation history embedded in prompts within a token budget.
+
+    The most recent messages that fit into ``token_budget`` are kept verbatim.
+    Older ones are replaced by a rolling per-chat summary. The summary is
+    extended incrementally in the background, once at least ``batch_turns``
+    turns it does not cover yet have accumulated, so the message being handled
+    never waits for it; until the update lands the previous summary is used.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, batch_turns: int = HISTORY_SUMMARY_BATCH_TURNS):
+        self.token_budget = token_budget
+        self.batch_turns = batch_turns
+        # chat_id -> (summary text, timestamp of the newest message it covers)
+        self.summaries = TTLCache(ttl=CONVERSATION_IDLE_TTL, maxsize=HISTORY_SUMMARY_CACHE_SIZE)
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.summary_calls = 0
+        self._refreshing: Dict[int, asyncio.Task] = {}
+
+    def compact(self, chat_id: int, history: List[Message]) -> List[Message]:
+        sizes = [estimate_tokens(f"{msg.role}: {msg.content}") for msg in history]
+        total = sum(sizes)
+
+        # Keep the newest messages that fit the budget; always keep the current message
+        kept, used = 0, 0
+        for size in reversed(sizes):
+            if kept and used + size > self.token_budget:
+                break
+            kept += 1
+            used += size
+        older, recent = history[:len(history) - kept], history[len(history) - kept:]
+
+        summary, covered_until = self.summaries.get(chat_id, ("", 0.0))
+        uncovered = [msg for msg in older if msg.timestamp > covered_until]
+        if len(uncovered) >= self.batch_turns:
+            self._schedule_refresh(chat_id, uncovered)
+
+        compacted = list(recent)
+        if summary:
+            compacted.insert(0, Message("system", f"Summary of earlier conversation: {summary}"))
+        self.tokens_in += total
+        self.tokens_out += sum(estimate_tokens(f"{msg.role}: {msg.content}") for msg in compacted)
+        return compacted
+
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+    def stats(self) -> dict:
+        return {
+            "prompt_tokens_in": self.tokens_in,
+            "prompt_tokens_out": self.tokens_out,
+            "prompt_tokens_saved": self.tokens_saved(),
+            "summary_calls": self.summary_calls,
+            "summaries": self.summaries.stats(),
+        }
+
+    def _schedule_refresh(self, chat_id: int, new_turns: List[Message]):
+        if chat_id in self._refreshing:
+            return  # the next compaction picks up whatever this refresh misses
+        task = asyncio.create_task(self._refresh(chat_id, new_turns))
+        self._refreshing[chat_id] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(chat_id, None))
+
+    async def _refresh(self, chat_id: int, new_turns: List[Message]):
+        summary, _ = self.summaries.get(chat_id, ("", 0.0))
+        try:
+            self.summary_calls += 1
+            response = await model_router.complete(
+                "summary",
+                messages=[{
+                    "role": "user",
+                    "content": HISTORY_SUMMARY_PROMPT.format(
+                        summary=summary or "(none yet)",
+                        new_turns=format_conversation_history(new_turns),
+                    ),
+                }],
+                max_tokens=200,
+            )
+            updated = response["choices"][0]["message"]["content"].strip()
+            self.summaries.set(chat_id, (updated, new_turns[-1].timestamp))
+        except Exception as e:
+            logger.error(f"Failed to update conversation summary for chat {chat_id}: {e}")
+
+
+history_compactor = HistoryCompactor()
@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Optional
+from app.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_TTL,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_DISK_PATH,
+    LLM_CACHE_HISTORY_WINDOW,
+)
+from app.utils.cache import TTLCache
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so "Hi!" and "hi" share a cache entry."""
+    text = re.sub(r"[^\w\s']", " ", text.lower())
+    return " ".join(text.split())
+
+
+class _DiskTier:
+    """SQLite-backed second cache tier that survives restarts."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._connection.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return _MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+
+
+class LLMResponseCache:
+    """Cache of LLM responses for prompts that repeat with near-identical inputs.
+
+    Keys combine the prompt template, the normalized user message, a hash of
+    the last ``history_window`` history messages before it and the model.
+    Entries live in an LRU+TTL memory tier and, if ``disk_path`` is set, in an
+    SQLite tier that survives restarts. Hits and misses are counted per call
+    site.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = LLM_CACHE_ENABLED,
+        ttl: float = LLM_CACHE_TTL,
+        maxsize: int = LLM_CACHE_SIZE,
+        disk_path: Optional[str] = LLM_CACHE_DISK_PATH,
+        history_window: int = LLM_CACHE_HISTORY_WINDOW,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.history_window = history_window
+        self.memory = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.disk = _DiskTier(disk_path) if enabled and disk_path else None
+        self.sites: Dict[str, Dict[str, int]] = {}
+
+    def make_key(self, template: str, user_message: str, history: List, model: str) -> str:
+        # The last history entry is the current user message, which is keyed separately
+        context = [
+            (msg.role, normalize_message(msg.content))
+            for msg in history[:-1][-self.history_window:]
+        ] if self.history_window else []
+        raw = json.dumps([
+            hashlib.sha256(template.encode()).hexdigest(),
+            normalize_message(user_message),
+            hashlib.sha256(json.dumps(context).encode()).hexdigest(),
+            model,
+        ])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, site: str, key: str) -> Any:
+        """Return the cached value or None, counting the lookup against ``site``."""
+        if not self.enabled:
+            return None
+        counters = self.sites.setdefault(site, {"hits": 0, "misses": 0})
+
+        value = self.memory.get(key, _MISSING)
+        if value is _MISSING and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache disk read failed: {e}")
+                value = _MISSING
+            if value is not _MISSING:
+                self.memory.set(key, value)
+
+        if value is _MISSING:
+            counters["misses"] += 1
+            return None
+        counters["hits"] += 1
+        return value
+
+    def set(self, site: str, key: str, value: Any):
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, self.ttl)
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            site: {**counters, "hit_rate": counters["hits"] / max(counters["hits"] + counters["misses"], 1)}
+            for site, counters in self.sites.items()
+        }
+
+
+llm_cache = LLMResponseCache()
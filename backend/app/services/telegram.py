@@ -1,43 +1,239 @@
+import asyncio
 import httpx
-from app.config import TELEGRAM_API_TOKEN
+import logging
+import re
+import time
+from typing import AsyncIterator, Dict, Optional
+from app.config import (
+    TELEGRAM_API_TOKEN,
+    TELEGRAM_HTTP2,
+    TELEGRAM_MAX_CONNECTIONS,
+    TELEGRAM_MAX_KEEPALIVE_CONNECTIONS,
+    TELEGRAM_KEEPALIVE_EXPIRY,
+    TELEGRAM_REQUEST_TIMEOUT,
+    TELEGRAM_MAX_RETRIES,
+    TELEGRAM_EDIT_INTERVAL,
+)
+from app.utils.metrics import span, stage_errors
+
+logger = logging.getLogger(__name__)
 
 TELEGRAM_API_BASE = f"https://api.telegram.org/bot{TELEGRAM_API_TOKEN}"
 
+# Failures before the request left, so retrying cannot deliver a message twice
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Methods that are safe to repeat after any transport error
+_IDEMPOTENT_METHODS = {"editMessageText", "setWebhook", "deleteWebhook"}
+
 def escape_markdown(text: str) -> str:
     """Escape special characters for Telegram MarkdownV2"""
-    special_chars = r'_*[]()~`>#+-=|{}.!'
+    # The backslash goes first, so the escapes added below are not escaped again
+    special_chars = '\\' + r'_*[]()~`>#+-=|{}.!'
     for char in special_chars:
         text = text.replace(char, f'\\{char}')
     return text
 
-async def send_telegram_message(chat_id: int, text: str, parse_mode: str = "MarkdownV2"):
-        """Send message to Telegram chat"""
-        # escaped_text = escape_markdown(text)
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{TELEGRAM_API_BASE}/sendMessage",
-                json={
-                    "chat_id": chat_id,
-                    "text": text,
-                    parse_mode: parse_mode,
-                }
-            )
-            return response.json()
+
+# A link, an escaped character or an entity marker in MarkdownV2 text
+_MARKDOWN_V2 = re.compile(r"\[((?:\\.|[^\]\\])*)\]\(((?:\\.|[^)\\])*)\)|\\(.)|[*_~`|]", re.DOTALL)
+_ESCAPED = re.compile(r"\\(.)", re.DOTALL)
+
+
+def strip_markdown(text: str) -> str:
+    """The plain text a MarkdownV2 message shows: markers dropped, escapes undone, links as "text (url)"."""
+    def plain(match):
+        if match.group(3) is not None:
+            return match.group(3)
+        if match.group(1) is not None:
+            url = _ESCAPED.sub(r"\1", match.group(2))
+            return f"{strip_markdown(match.group(1))} ({url})"
+        return ""
+    return _MARKDOWN_V2.sub(plain, text)
+
+
+async def send_telegram_message(chat_id: int, text: str, parse_mode: Optional[str] = None):
+        """Send message to Telegram chat; pass parse_mode="MarkdownV2" only for text escaped with escape_markdown"""
+        return await telegram_service.send_message(chat_id, text, parse_mode)
 
 
 class TelegramBotService:
-    def start(self):
+    """Owns the long-lived HTTP client used for every Telegram Bot API call.
+
+    The client is opened in the FastAPI lifespan and reused across requests so
+    messages go over already established keep-alive (HTTP/2) connections.
+    Sends to the same chat are serialized to preserve their order.
+    """
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        # chat_id -> [lock, number of senders holding or waiting for it]
+        self._chat_locks: Dict[int, list] = {}
+
+    async def start(self):
+        self._get_client()
         print("Telegram bot started...")  # For debugging
 
-    def stop(self):
+    async def stop(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
         print("Telegram bot stopped...")  # For debugging
-        
-    
-    
 
-        
-        
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=TELEGRAM_API_BASE,
+                http2=TELEGRAM_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=TELEGRAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=TELEGRAM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=TELEGRAM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=TELEGRAM_REQUEST_TIMEOUT,
+            )
+        return self.client
+
+    async def call(self, method: str, **params) -> dict:
+        """Call a Bot API method, backing off on 429 responses as told by ``retry_after``.
+
+        Transport errors are retried for idempotent methods; sends are only
+        retried when the request never reached Telegram.
+        """
+        with span("telegram_send"):
+            result = await self._call(method, params)
+        if not result.get("ok"):
+            stage_errors.inc(stage="telegram_send")
+        return result
+
+    async def _call(self, method: str, params: dict) -> dict:
+        client = self._get_client()
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            try:
+                response = await client.post(f"/{method}", json=params)
+            except httpx.TransportError as e:
+                retryable = method in _IDEMPOTENT_METHODS or isinstance(e, _NOT_SENT_ERRORS)
+                if attempt == TELEGRAM_MAX_RETRIES or not retryable:
+                    logger.error(f"Telegram {method} failed: {e}")
+                    return {"ok": False, "description": str(e)}
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+
+            try:
+                result = response.json()
+            except ValueError:
+                result = {"ok": False, "error_code": response.status_code, "description": response.text}
+            if response.status_code != 429 or attempt == TELEGRAM_MAX_RETRIES:
+                return result
+
+            retry_after = result.get("parameters", {}).get("retry_after", 1)
+            logger.warning(f"Telegram rate limit on {method}, retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = None) -> dict:
+        """Send a message, keeping sends to the same chat in submission order."""
+        async with self._chat_lock(chat_id):
+            return await self._with_plain_fallback("sendMessage", parse_mode, chat_id=chat_id, text=text)
+
+    async def edit_message(self, chat_id: int, message_id: int, text: str, parse_mode: Optional[str] = None) -> dict:
+        return await self._with_plain_fallback(
+            "editMessageText", parse_mode, chat_id=chat_id, message_id=message_id, text=text
+        )
+
+    async def stream_message(self, chat_id: int, chunks: AsyncIterator[str]) -> str:
+        """Show a plain-text reply while it is being generated and return the full text.
+
+        The first chunk is sent as a new message, which is then edited as more
+        text arrives, at most once per ``TELEGRAM_EDIT_INTERVAL`` seconds to
+        stay within Telegram's edit rate limits. ``chunks`` has to end on its
+        own (``stream_completion`` times out), as the chat stays locked until then.
+        """
+        async with self._chat_lock(chat_id):
+            text, shown, message_id, last_edit = "", "", None, 0.0
+            async for delta in chunks:
+                text += delta
+                if message_id is None:
+                    result = await self.call("sendMessage", chat_id=chat_id, text=text)
+                    message_id = result.get("result", {}).get("message_id")
+                    if message_id is None:
+                        break  # could not start the message; deliver the full text at the end
+                    shown, last_edit = text, time.monotonic()
+                elif time.monotonic() - last_edit >= TELEGRAM_EDIT_INTERVAL:
+                    await self.edit_message(chat_id, message_id, text)
+                    shown, last_edit = text, time.monotonic()
+
+            if message_id is None:
+                async for delta in chunks:
+                    text += delta
+                if text:
+                    await self.call("sendMessage", chat_id=chat_id, text=text)
+            elif text != shown:
+                await self.edit_message(chat_id, message_id, text)
+            return text
+
+    async def _with_plain_fallback(self, method: str, parse_mode: Optional[str], **params) -> dict:
+        if parse_mode:
+            params["parse_mode"] = parse_mode
+        result = await self.call(method, **params)
+
+        # Last resort for text Telegram could not parse after all: send what it would have shown, unformatted
+        if parse_mode and not result.get("ok") and "can't parse entities" in result.get("description", ""):
+            params.pop("parse_mode")
+            params["text"] = strip_markdown(params["text"])
+            result = await self.call(method, **params)
+        return result
+
+    async def set_webhook(self, url: str) -> dict:
+        return await self.call("setWebhook", url=url)
+
+    async def delete_webhook(self) -> dict:
+        return await self.call("deleteWebhook")
+
+    async def get_updates(self, offset: Optional[int], limit: int, timeout: float) -> dict:
+        """Long-poll for up to ``limit`` updates, waiting at most ``timeout`` seconds for the first one.
+
+        Updates before ``offset`` are confirmed and not delivered again.
+        Errors are returned, not retried; the polling loop backs off itself.
+        """
+        client = self._get_client()
+        params = {"limit": limit, "timeout": int(timeout)}
+        if offset is not None:
+            params["offset"] = offset
+        try:
+            # The connection stays open for the whole poll, so the read timeout has to outlast it
+            response = await client.post("/getUpdates", json=params, timeout=timeout + TELEGRAM_REQUEST_TIMEOUT)
+            return response.json()
+        except (httpx.TransportError, ValueError) as e:
+            return {"ok": False, "description": str(e)}
+
+    def _chat_lock(self, chat_id: int):
+        return _ChatLock(self._chat_locks, chat_id)
+
+
+class _ChatLock:
+    """Per-chat lock that drops its entry once nobody holds or waits for it."""
+
+    def __init__(self, locks: Dict[int, list], chat_id: int):
+        self.locks = locks
+        self.chat_id = chat_id
+
+    async def __aenter__(self):
+        entry = self.locks.setdefault(self.chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_ref(entry)
+            raise
+
+    async def __aexit__(self, *exc_info):
+        entry = self.locks[self.chat_id]
+        entry[0].release()
+        self._release_ref(entry)
+
+    def _release_ref(self, entry: list):
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.locks[self.chat_id]
 
-        
-        
 
+telegram_service = TelegramBotService()
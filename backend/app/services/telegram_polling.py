@@ -0,0 +1,91 @@
+from typing import Optional
+from app.api.models import TelegramUpdate
+from app.config import (
+    TELEGRAM_POLL_LIMIT,
+    TELEGRAM_POLL_TIMEOUT,
+    TELEGRAM_POLL_RETRY_DELAY,
+)
+from app.services.telegram import TelegramBotService, telegram_service
+from app.services.update_queue import UpdateDispatcher, QueueFull
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramPoller:
+    """Receive updates by long-polling ``getUpdates`` instead of through the webhook.
+
+    Each poll waits up to ``timeout`` seconds on the shared keep-alive client
+    and returns up to ``limit`` updates at once, which are handed to the same
+    dispatcher the webhook feeds. The offset only moves past an update once
+    the dispatcher accepted it, so updates rejected by a full queue are
+    fetched again on the next poll; redeliveries are dropped by the
+    dispatcher's dedupe window.
+    """
+
+    def __init__(
+        self,
+        dispatcher: UpdateDispatcher,
+        telegram: TelegramBotService = telegram_service,
+        limit: int = TELEGRAM_POLL_LIMIT,
+        timeout: float = TELEGRAM_POLL_TIMEOUT,
+        retry_delay: float = TELEGRAM_POLL_RETRY_DELAY,
+    ):
+        self.dispatcher = dispatcher
+        self.telegram = telegram
+        self.limit = limit
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.offset: Optional[int] = None
+        self.polls = 0
+        self.updates = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="telegram-poller")
+            logger.info(f"Polling Telegram for updates (limit {self.limit}, timeout {self.timeout:g}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self.offset is not None:
+            # Confirm what was accepted so a restart does not fetch it again
+            await self.telegram.get_updates(self.offset, limit=1, timeout=0)
+
+    def stats(self) -> dict:
+        return {"polls": self.polls, "updates": self.updates, "errors": self.errors, "offset": self.offset}
+
+    async def _run(self):
+        failures = 0
+        while True:
+            result = await self.telegram.get_updates(self.offset, self.limit, self.timeout)
+            self.polls += 1
+            if not result.get("ok"):
+                self.errors += 1
+                failures += 1
+                delay = min(self.retry_delay * 2 ** (failures - 1), self.timeout)
+                logger.error(f"getUpdates failed: {result.get('error_code')} - {result.get('description')}, "
+                             f"retrying in {delay:g}s")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            if not await self._submit_all(result.get("result", [])):
+                await asyncio.sleep(self.retry_delay)
+
+    async def _submit_all(self, updates: list) -> bool:
+        """Hand a batch to the dispatcher; False if it stopped early because the queue was full."""
+        for raw in updates:
+            try:
+                await self.dispatcher.submit(TelegramUpdate(**raw))
+            except QueueFull:
+                logger.warning(f"Update queue is full, fetching update {raw['update_id']} again later")
+                return False
+            self.offset = raw["update_id"] + 1
+            self.updates += 1
+        return True
@@ -0,0 +1,91 @@
+from typing import Optional
+from google.auth.exceptions import RefreshError
+from app.config import (
+    TOKEN_REFRESH_INTERVAL,
+    TOKEN_REFRESH_MARGIN,
+    TOKEN_REFRESH_IDLE_TTL,
+    TOKEN_REFRESH_CONCURRENCY,
+)
+from app.services.google_calendar import AsyncGoogleCalendarService
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher:
+    """Background task that renews Google access tokens before they expire.
+
+    Every ``interval`` seconds, tokens of chats active within ``idle_ttl``
+    seconds that expire within ``margin`` seconds are refreshed on the
+    calendar workers, at most ``concurrency`` at a time. Messages from those
+    chats then always find a valid token and never wait for a refresh.
+    """
+
+    def __init__(
+        self,
+        calendar_service: AsyncGoogleCalendarService,
+        interval: float = TOKEN_REFRESH_INTERVAL,
+        margin: float = TOKEN_REFRESH_MARGIN,
+        idle_ttl: float = TOKEN_REFRESH_IDLE_TTL,
+        concurrency: int = TOKEN_REFRESH_CONCURRENCY,
+    ):
+        self.calendar_service = calendar_service
+        self.interval = interval
+        self.margin = margin
+        self.idle_ttl = idle_ttl
+        self.concurrency = concurrency
+        self.refreshed = 0
+        self.revoked = 0
+        self.failed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="token-refresher")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def refresh_due(self):
+        """Refresh every token that is due now."""
+        due = self.calendar_service.sync.tokens_due(self.margin, self.idle_ttl)
+        if not due:
+            return
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(chat_id):
+            async with semaphore:
+                await self._refresh(chat_id)
+
+        await asyncio.gather(*(refresh(chat_id) for chat_id in due))
+
+    def stats(self) -> dict:
+        return {"refreshed": self.refreshed, "revoked": self.revoked, "failed": self.failed}
+
+    async def _run(self):
+        try:
+            await self.calendar_service.index_stored_tokens()
+        except Exception as e:
+            logger.error(f"Failed to index stored credentials: {e}")
+        while True:
+            await self.refresh_due()
+            await asyncio.sleep(self.interval)
+
+    async def _refresh(self, chat_id):
+        try:
+            await self.calendar_service.refresh_credentials(chat_id, self.margin)
+            self.refreshed += 1
+        except RefreshError as e:
+            # The user revoked access or the refresh token expired; they have to sign in again
+            logger.warning(f"Credentials of chat {chat_id} were rejected on refresh: {e}")
+            self.calendar_service.sync.forget_credentials(chat_id)
+            self.revoked += 1
+        except Exception as e:
+            # Transient (network, timeout): retried on the next tick while the token is still due
+            logger.error(f"Failed to refresh credentials of chat {chat_id}: {e}")
+            self.failed += 1
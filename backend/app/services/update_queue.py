@@ -0,0 +1,216 @@
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+from app.api.models import TelegramUpdate
+from app.config import (
+    UPDATE_WORKERS,
+    UPDATE_QUEUE_SIZE,
+    UPDATE_ENQUEUE_TIMEOUT,
+    UPDATE_DEDUPE_WINDOW,
+    UPDATE_COALESCE_WINDOW,
+    UPDATE_COALESCE_MAX,
+)
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the dispatcher cannot accept another update in time."""
+
+
+def chat_key(update: TelegramUpdate) -> Optional[Hashable]:
+    """Ordering key of an update: its chat id, or None for updates without a message."""
+    if update.message and "chat" in update.message:
+        return update.message["chat"].get("id")
+    return None
+
+
+def is_text(update: TelegramUpdate) -> bool:
+    return bool(update.message and update.message.get("text"))
+
+
+def merge_updates(updates: List[TelegramUpdate]) -> TelegramUpdate:
+    """One update carrying the texts of ``updates`` on separate lines, as the last of them."""
+    if len(updates) == 1:
+        return updates[0]
+    last = updates[-1]
+    text = "\n".join(update.message["text"] for update in updates)
+    return TelegramUpdate(update_id=last.update_id, message={**last.message, "text": text})
+
+
+class UpdateDispatcher:
+    """Queue Telegram updates and process them on a pool of asyncio workers.
+
+    Updates of the same chat are handled one at a time in arrival order,
+    while different chats are processed concurrently. At most ``queue_size``
+    updates wait at once; ``submit`` raises QueueFull when no slot frees up
+    within ``enqueue_timeout`` so the caller can ask Telegram to retry later.
+    Update ids seen within the last ``dedupe_window`` updates are dropped.
+
+    Bursts of short messages ("meeting tomorrow", "at 3", "with Bob") are
+    coalesced: a ``mergeable`` update waits until its chat has been quiet for
+    ``coalesce_window`` seconds, and the mergeable updates queued right
+    behind it (including those that arrived while the previous one was being
+    handled) are merged into a single update of up to ``coalesce_max``
+    messages, so they go through the pipeline, and the LLM, once.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[TelegramUpdate], Awaitable[object]],
+        workers: int = UPDATE_WORKERS,
+        queue_size: int = UPDATE_QUEUE_SIZE,
+        enqueue_timeout: float = UPDATE_ENQUEUE_TIMEOUT,
+        dedupe_window: int = UPDATE_DEDUPE_WINDOW,
+        coalesce_window: float = UPDATE_COALESCE_WINDOW,
+        coalesce_max: int = UPDATE_COALESCE_MAX,
+        mergeable: Callable[[TelegramUpdate], bool] = is_text,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.enqueue_timeout = enqueue_timeout
+        self.dedupe_window = dedupe_window
+        self.coalesce_window = coalesce_window
+        self.coalesce_max = coalesce_max
+        self.mergeable = mergeable
+
+        self.processed = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.failed = 0
+        self.coalesced = 0
+
+        self._pending: Dict[Hashable, deque] = {}
+        self._last_arrival: Dict[Hashable, float] = {}
+        self._scheduled = set()
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._ready: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"update-worker-{i}") for i in range(self.workers)]
+        logger.info(f"Started {self.workers} update workers")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Stop the workers, giving queued updates up to ``drain_timeout`` seconds to finish."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._drained(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.pending_count()} queued updates on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, update: TelegramUpdate) -> bool:
+        """Queue an update. Returns False if it was a redelivery of a recent update."""
+        if update.update_id in self._seen:
+            self.duplicates += 1
+            return False
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFull(f"Update queue is full ({self.queue_size} pending)")
+
+        # Checked again: a redelivery may have been accepted while we waited for a slot
+        if update.update_id in self._seen:
+            self._slots.release()
+            self.duplicates += 1
+            return False
+        self._remember(update.update_id)
+
+        key = chat_key(update)
+        self._pending.setdefault(key, deque()).append(update)
+        self._last_arrival[key] = time.monotonic()
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return True
+
+    def pending_count(self) -> int:
+        return sum(len(updates) for updates in self._pending.values())
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending_count(),
+            "processed": self.processed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+        }
+
+    def _remember(self, update_id: int):
+        self._seen[update_id] = None
+        while len(self._seen) > self.dedupe_window:
+            self._seen.popitem(last=False)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            try:
+                await self._drain_chat(key)
+            finally:
+                self._ready.task_done()
+
+    async def _drain_chat(self, key: Hashable):
+        pending = self._pending[key]
+        wait = 0.0
+        try:
+            while pending:
+                wait = self._quiet_in(key, pending)
+                if wait > 0:
+                    break
+                batch = self._take_batch(key, pending)
+                for _ in batch:
+                    self._slots.release()
+                self.coalesced += len(batch) - 1
+                update = merge_updates(batch)
+                try:
+                    await self.handler(update)
+                    self.processed += 1
+                except Exception:
+                    self.failed += 1
+                    logger.exception(f"Error processing update {update.update_id}")
+        finally:
+            # No await between the last emptiness check and here, so no update can slip in unscheduled
+            if not pending:
+                del self._pending[key]
+                self._last_arrival.pop(key, None)
+                self._scheduled.discard(key)
+            elif wait > 0:
+                # The worker moves on to other chats; this one is picked up again once it is quiet
+                asyncio.get_running_loop().call_later(wait, self._ready.put_nowait, key)
+            else:
+                self._ready.put_nowait(key)
+
+    def _quiet_in(self, key: Hashable, pending: deque) -> float:
+        """Seconds until the chat's next text message may be handled: quiet for ``coalesce_window`` or a full batch."""
+        if key is None or not self.mergeable(pending[0]) or len(pending) >= self.coalesce_max:
+            return 0.0
+        return self._last_arrival[key] + self.coalesce_window - time.monotonic()
+
+    def _take_batch(self, key: Hashable, pending: deque) -> List[TelegramUpdate]:
+        """The next update, plus the mergeable updates right behind it when it is mergeable too."""
+        batch = [pending.popleft()]
+        if key is None or not self.mergeable(batch[0]):
+            return batch
+        while pending and len(batch) < self.coalesce_max and self.mergeable(pending[0]):
+            batch.append(pending.popleft())
+        return batch
+
+    async def _drained(self):
+        while self._pending:
+            await asyncio.sleep(0.05)
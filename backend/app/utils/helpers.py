@@ -1,7 +1,11 @@
 def format_conversation_history(history: list) -> str:
         """Format the conversation history into a structured format"""
         formatted_history = "\n".join(
-            [f"{msg['role'].capitalize()}: {msg['content']}" for msg in history]
+            [f"{msg.role.capitalize()}: {msg.content}" for msg in history]
         )
         return formatted_history
-    
\ No newline at end of file
+    
+
+def estimate_tokens(text: str) -> int:
+        """Cheap token estimate (about 4 characters per token) used for prompt budgeting"""
+        return len(text) // 4 + 1
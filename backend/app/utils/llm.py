@@ -0,0 +1,61 @@
+from app.utils.metrics import llm_cost, llm_requests, llm_tokens, stage_errors
+import importlib
+
+
+def load_litellm():
+    """Import litellm; it takes seconds, so it is done on first use (or by the startup warm-up)."""
+    return importlib.import_module("litellm")
+
+
+async def acompletion(*args, **kwargs):
+    """``litellm.acompletion`` without importing litellm when the app starts.
+
+    Counts requests, failures, tokens (including prompt tokens served from the
+    provider's cache) and cost per model. Streams are asked to report their
+    usage in the last chunk and are counted once they have been read to the end.
+    """
+    model = kwargs.get("model", "")
+    llm_requests.inc(model=model)
+    litellm = load_litellm()
+    if kwargs.get("stream"):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+    try:
+        response = await litellm.acompletion(*args, **kwargs)
+    except Exception:
+        stage_errors.inc(stage="llm")
+        raise
+    if kwargs.get("stream"):
+        return _counted_stream(litellm, model, response)
+    _record_usage(litellm, model, getattr(response, "usage", None), response)
+    return response
+
+
+async def _counted_stream(litellm, model: str, chunks):
+    usage = None
+    try:
+        async for chunk in chunks:
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+    _record_usage(litellm, model, usage)
+
+
+def _record_usage(litellm, model: str, usage, response=None):
+    if usage is None:
+        return
+    llm_tokens.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    llm_tokens.inc(usage.completion_tokens or 0, model=model, kind="completion")
+    # Prompt tokens the provider served from its prefix cache (a subset of "prompt")
+    details = getattr(usage, "prompt_tokens_details", None)
+    llm_tokens.inc(getattr(details, "cached_tokens", None) or 0, model=model, kind="cached")
+    try:
+        if response is not None:
+            llm_cost.inc(litellm.completion_cost(completion_response=response), model=model)
+        else:
+            llm_cost.inc(sum(litellm.cost_per_token(
+                model=model, prompt_tokens=usage.prompt_tokens or 0, completion_tokens=usage.completion_tokens or 0,
+            )), model=model)
+    except Exception:
+        pass  # model missing from litellm's price list
@@ -0,0 +1,211 @@
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import bisect
+import threading
+import time
+
+# Seconds; spans range from cache hits (sub-millisecond) to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (
+        name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observations per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # label set -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def snapshot(self) -> Dict[LabelKey, Tuple[int, float]]:
+        """Observation count and sum per label set."""
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._values.items()}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+def stats_gauges(prefix: str, stats: dict, label: Optional[str] = None) -> Dict[str, List[Tuple[LabelKey, float]]]:
+    """Turn a ``stats()`` dict into gauge samples named ``prefix_<key>``.
+
+    Nested dicts extend the name, except that with ``label`` the top-level
+    keys become values of that label (``{"relevancy": {"hits": 3}}`` with
+    ``label="site"`` gives ``prefix_hits{site="relevancy"} 3``). Values that
+    are not numbers are skipped.
+    """
+    gauges: Dict[str, List[Tuple[LabelKey, float]]] = {}
+
+    def add(name: str, value, labels: LabelKey):
+        if isinstance(value, dict):
+            for key, nested in value.items():
+                add(f"{name}_{key}", nested, labels)
+        elif isinstance(value, (int, float)):
+            gauges.setdefault(name, []).append((labels, float(value)))
+
+    for key, value in stats.items():
+        if label is not None:
+            add(prefix, value, ((label, str(key)),))
+        else:
+            add(f"{prefix}_{key}", value, ())
+    return gauges
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text exposition format.
+
+    Counters and histograms are updated as things happen. Collectors are
+    called at scrape time and return gauges built from the ``stats()`` of
+    the long-lived services, so those keep their own counters.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: List[Callable[[], Dict[str, List[Tuple[LabelKey, float]]]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def add_collector(self, collector: Callable[[], Dict[str, List[Tuple[LabelKey, float]]]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            for name, samples in collector().items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_format_labels(key)} {_format_value(value)}" for key, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.histogram(
+    "calbot_stage_seconds", "Time spent in each stage of handling an update"
+)
+stage_errors = registry.counter(
+    "calbot_stage_errors_total", "Failures per stage"
+)
+llm_requests = registry.counter(
+    "calbot_llm_requests_total", "LLM completion requests per model"
+)
+llm_tokens = registry.counter(
+    "calbot_llm_tokens_total", "LLM tokens per model and kind (prompt, completion, cached prompt)"
+)
+llm_cost = registry.counter(
+    "calbot_llm_cost_usd_total", "Estimated LLM spend per model, in US dollars"
+)
+llm_seconds = registry.histogram(
+    "calbot_llm_seconds", "LLM call latency per model and task, including retries and hedging"
+)
+llm_retries = registry.counter(
+    "calbot_llm_retries_total", "LLM requests retried after a timeout or retryable error, per model"
+)
+llm_hedges = registry.counter(
+    "calbot_llm_hedges_total", "Hedged LLM requests per model and outcome (won, lost)"
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into ``calbot_stage_seconds`` and count exceptions escaping it as errors."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage)
+
+
+def timed(stage: str):
+    """Decorator running a coroutine function inside ``span(stage)``."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from app.config import QUERY_DETAIL_LIMIT
+from app.services.telegram import escape_markdown
+
+
+def _time_value(value) -> str:
+    """ISO string of an event start/end given as an API dict ({"dateTime"} or {"date"}) or as a string."""
+    if isinstance(value, dict):
+        return value.get("dateTime") or value.get("date") or ""
+    return value or ""
+
+
+def _day(moment: datetime) -> str:
+    return f"{moment:%a} {moment.day} {moment:%b}"
+
+
+def format_when(start, end=None) -> str:
+    """Human-readable span like "Tue 4 Mar, 15:00-16:00"; all-day events show only their date(s)."""
+    start_text, end_text = _time_value(start), _time_value(end)
+    try:
+        start_at = datetime.fromisoformat(start_text.replace("Z", "+00:00"))
+        end_at = datetime.fromisoformat(end_text.replace("Z", "+00:00")) if end_text else None
+    except ValueError:
+        return start_text
+    if len(start_text) == 10:  # all-day: the end date is exclusive
+        if end_at is None or (end_at - start_at).days <= 1:
+            return _day(start_at)
+        return f"{_day(start_at)} - {_day(end_at - timedelta(days=1))}"
+    if end_at is None:
+        return f"{_day(start_at)}, {start_at:%H:%M}"
+    if end_at.date() == start_at.date():
+        return f"{_day(start_at)}, {start_at:%H:%M}-{end_at:%H:%M}"
+    return f"{_day(start_at)} {start_at:%H:%M} - {_day(end_at)} {end_at:%H:%M}"
+
+
+def _title(event: dict) -> str:
+    return f"*{escape_markdown(event.get('summary') or 'Untitled event')}*"
+
+
+def _link(text: str, url: Optional[str]) -> str:
+    if not url:
+        return ""
+    # Inside the URL part of a MarkdownV2 link only ")" and "\" need escaping
+    url = url.replace("\\", "\\\\").replace(")", "\\)")
+    return f"[{escape_markdown(text)}]({url})"
+
+
+def render_auth_prompt(url: str) -> str:
+    return f"{escape_markdown('To use this bot, please authenticate your Google account:')} {_link('Click here', url)}"
+
+
+def render_created(event: dict) -> str:
+    when = escape_markdown(format_when(event.get("start"), event.get("end")))
+    return f"Created {_title(event)} on {when}\\. {_link('Open in Google Calendar', event.get('htmlLink'))}".rstrip()
+
+
+def render_updated(event: dict) -> str:
+    when = escape_markdown(format_when(event.get("start"), event.get("end")))
+    return f"Updated {_title(event)}, now on {when}\\. {_link('Open in Google Calendar', event.get('htmlLink'))}".rstrip()
+
+
+def render_deleted(event: dict) -> str:
+    when = escape_markdown(format_when(event.get("start"), event.get("end")))
+    return f"Deleted {_title(event)} \\({when}\\)\\."
+
+
+def render_batch(intent: str, done: int, total: int) -> str:
+    verb = "Deleted" if intent == "delete" else "Updated"
+    return escape_markdown(f"{verb} {done} of {total} events.")
+
+
+def render_bulk_confirm(intent: str, events: list) -> str:
+    """Ask before updating or deleting several events at once."""
+    lines = [escape_markdown(f"This will {intent} {len(events)} events:")]
+    lines += [
+        f"{idx + 1}\\. {_title(event)}, {escape_markdown(format_when(event['start'], event.get('end')))}"
+        for idx, event in enumerate(events)
+    ]
+    lines.append(escape_markdown(f'Reply "yes" to {intent} them all, anything else cancels.'))
+    return "\n".join(lines)
+
+
+def render_bulk_refused(intent: str, count: int, reason: str) -> str:
+    return escape_markdown(f"I can't {intent} all {count} events at once: {reason}. Please change them one at a time.")
+
+
+def render_failure(intent: str, message: Optional[str] = None) -> str:
+    reason = f": {message.rstrip('.')}" if message else ""
+    return escape_markdown(f"I couldn't {intent} the event{reason}. Please try again.")
+
+
+def render_not_found(event_data: dict, failed_calendars: list = ()) -> str:
+    text = "I couldn't find any events"
+    if event_data.get("event_name"):
+        text += f" matching \"{event_data['event_name']}\""
+    if event_data.get("date") and event_data.get("end_date"):
+        text += f" between {event_data['date']} and {event_data['end_date']}"
+    elif event_data.get("date"):
+        text += f" on {event_data['date']}"
+    text += "."
+    if failed_calendars:
+        text += f" Some calendars could not be reached: {', '.join(failed_calendars)}."
+    return escape_markdown(text)
+
+
+def render_event_list(events: list, truncated: bool = False, failed_calendars: list = (),
+                      detail_limit: int = QUERY_DETAIL_LIMIT) -> str:
+    """Numbered list of queried events, or a per-day summary for long listings."""
+    count = f"{len(events)}{'+' if truncated else ''} event{'s' if len(events) != 1 else ''}"
+    lines = [escape_markdown(f"Here's what you have ({count}):")]
+    if len(events) <= detail_limit:
+        lines += [
+            f"{idx + 1}\\. {_title(event)}, {escape_markdown(format_when(event['start'], event.get('end')))}"
+            for idx, event in enumerate(events)
+        ]
+    else:
+        days = {}
+        for event in events:
+            days.setdefault(_time_value(event["start"])[:10], []).append(event.get("summary") or "Untitled event")
+        for day, titles in days.items():
+            more = f" and {len(titles) - 3} more" if len(titles) > 3 else ""
+            line = f"{format_when(day)}: {len(titles)} event{'s' if len(titles) != 1 else ''} ({', '.join(titles[:3])}{more})"
+            lines.append(escape_markdown(line))
+    if truncated:
+        lines.append(escape_markdown("...and more events not shown. Ask about a shorter period to see them all."))
+    if failed_calendars:
+        lines.append(escape_markdown(f"Couldn't reach these calendars right now: {', '.join(failed_calendars)}"))
+    return "\n".join(lines)
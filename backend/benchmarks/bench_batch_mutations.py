@@ -0,0 +1,65 @@
+"""Round-trips for bulk changes ("cancel all my meetings tomorrow"), one request per event vs batched.
+
+Each stub API round-trip takes ``--latency`` seconds. Run from the
+``backend`` directory::
+
+    python -m benchmarks.bench_batch_mutations --events 30 --latency 0.1
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.services import google_calendar
+from app.services.google_calendar import GoogleCalendarService
+from benchmarks.stubs import FakeCalendarApi, connect_chats, make_event
+
+CHAT_ID = 1
+
+
+def build_service(n_events: int, latency: float) -> tuple:
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    events = [make_event(f"evt{i}", f"Meeting {i}", (start + timedelta(minutes=20 * i)).isoformat())
+              for i in range(n_events)]
+    service = GoogleCalendarService()
+    api = FakeCalendarApi(latency=latency, events=events)
+    connect_chats(service, api, [CHAT_ID])
+    service.peek_session(CHAT_ID).settings_cache.set("setting:timezone", "UTC")
+    return service, api
+
+
+def run(action: str, batched: bool, n_events: int, latency: float) -> tuple:
+    service, api = build_service(n_events, latency)
+    event_data = {"description": "Moved to the new room"}
+    event_ids = list(api.events_by_id)
+
+    started = time.perf_counter()
+    if batched:
+        results = service.batch_mutate(CHAT_ID, [
+            {"action": action, "event_id": event_id, "event_data": event_data} for event_id in event_ids
+        ])
+    else:
+        results = [
+            service.delete_event(CHAT_ID, event_id) if action == "delete"
+            else service.update_event(CHAT_ID, event_id, event_data)
+            for event_id in event_ids
+        ]
+    elapsed = time.perf_counter() - started
+    return elapsed, api.round_trips, sum(result["success"] for result in results)
+
+
+def main(args):
+    google_calendar.EVENTS_CACHE_ENABLED = False
+    for action in ("update", "delete"):
+        for batched in (False, True):
+            elapsed, round_trips, done = run(action, batched, args.events, args.latency)
+            print(
+                f"{action:6} {'batched   ' if batched else 'one by one'}: {round_trips:3} round-trips, "
+                f"{elapsed * 1000:6.0f} ms, {done}/{args.events} succeeded"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.1)
+    main(parser.parse_args())
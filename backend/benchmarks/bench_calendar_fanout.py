@@ -0,0 +1,73 @@
+"""Latency of a week query across several connected calendars, sequential vs concurrent fan-out.
+
+Each stub calendar answers after ``--latency`` seconds. The last scenario
+adds one calendar that errors and one that is slower than the per-calendar
+timeout, to show partial results. Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_calendar_fanout --calendars 6 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from app.services import google_calendar
+from app.services.google_calendar import AsyncGoogleCalendarService, GoogleCalendarService
+from benchmarks.stubs import FakeCalendarApi, MultiCalendarApi, connect_chats, make_event
+
+CHAT_ID = 1
+
+
+def build_service(n_calendars: int, latency: float, n_events: int, faulty: bool) -> AsyncGoogleCalendarService:
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+    calendars = {}
+    for c in range(n_calendars):
+        events = [
+            make_event(f"cal{c}-evt{i}", f"Event {i} of calendar {c}",
+                       (start + timedelta(days=i % 7, minutes=45 * (i // 7) + 5 * c)).isoformat())
+            for i in range(n_events)
+        ]
+        calendars[f"calendar{c}"] = FakeCalendarApi(latency=latency, events=events)
+    if faulty:
+        calendars["broken"] = FakeCalendarApi(latency=latency, error=RuntimeError("403 Forbidden"))
+        calendars["slow"] = FakeCalendarApi(latency=latency * 20)
+
+    sync_service = GoogleCalendarService(calendar_ids=list(calendars))
+    connect_chats(sync_service, MultiCalendarApi(calendars), [CHAT_ID])
+    sync_service.list_calendars(CHAT_ID)  # the calendar list is cached in a running bot
+    return AsyncGoogleCalendarService(sync_service, max_workers=len(calendars),
+                                      fanout_concurrency=len(calendars), calendar_timeout=latency * 5)
+
+
+async def run(service: AsyncGoogleCalendarService, concurrent: bool) -> tuple:
+    today = datetime.now()
+    query = {"date": today.strftime("%Y-%m-%d"), "end_date": (today + timedelta(days=6)).strftime("%Y-%m-%d")}
+    started = time.perf_counter()
+    if concurrent:
+        result = await service.query_events(CHAT_ID, query)
+    else:
+        result = await service._run(service.sync.query_events, CHAT_ID, query)
+    return time.perf_counter() - started, result
+
+
+def main(args):
+    google_calendar.EVENTS_CACHE_ENABLED = False  # measure the API round-trips themselves
+    scenarios = [("healthy", False)] + ([("faulty", True)] if not args.skip_faulty else [])
+    for name, faulty in scenarios:
+        for concurrent in (False, True):
+            service = build_service(args.calendars, args.latency, args.events, faulty)
+            elapsed, result = asyncio.run(run(service, concurrent))
+            service.shutdown()
+            print(
+                f"{name:8} {'concurrent' if concurrent else 'sequential'}: {elapsed * 1000:7.0f} ms, "
+                f"{len(result.get('events', []))} events (truncated: {result.get('truncated')}), failed calendars: {result.get('failed_calendars')}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calendars", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--events", type=int, default=40)
+    parser.add_argument("--skip-faulty", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,91 @@
+"""Load test: update processing latency for light messages while Calendar calls are slow.
+
+Replays interleaved "what do I have tomorrow" (slow Calendar query) and "hi"
+(no Calendar call) updates, arriving ``--gap`` seconds apart, through the
+update pipeline, once with Calendar calls run inline on the event loop and
+once through the thread-pool facade. A light update's latency runs from its
+arrival time to the end of its processing. Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_calendar_offload --calendar-latency 0.5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.api import routes
+from app.api.models import TelegramUpdate
+from app.services.telegram import TELEGRAM_API_BASE, telegram_service
+from benchmarks.stubs import FakeCalendarApi, connect_chats, make_event, telegram_transport
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {"chat": {"id": update_id}, "text": text}}
+
+
+async def run_inline(func, *args):
+    return func(*args)
+
+
+async def run(mode: str, n_slow: int, n_light: int, calendar_latency: float, gap: float) -> dict:
+    api = FakeCalendarApi(
+        latency=calendar_latency,
+        events=[make_event("evt1", "Standup", "2030-01-01T09:00:00")],
+    )
+    connect_chats(routes.calendar_service.sync, api, range(2 * max(n_slow, n_light)))
+    if mode == "inline":
+        routes.calendar_service._run = run_inline
+    else:
+        vars(routes.calendar_service).pop("_run", None)
+    telegram_service.client = httpx.AsyncClient(base_url=TELEGRAM_API_BASE, transport=telegram_transport())
+
+    light_latencies = []
+
+    async def process(update, record, arrived):
+        # Timed from the scheduled arrival, not from when the task gets to run:
+        # an event loop blocked by inline Calendar calls delays that too
+        await asyncio.sleep(max(arrived - time.perf_counter(), 0))
+        await routes.process_update(TelegramUpdate(**update))
+        if record:
+            light_latencies.append(time.perf_counter() - arrived)
+
+    updates = []
+    for i in range(max(n_slow, n_light)):
+        if i < n_slow:
+            updates.append((make_update(2 * i, "what do I have tomorrow?"), False))
+        if i < n_light:
+            updates.append((make_update(2 * i + 1, "hi"), True))
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        process(update, record, started + k * gap) for k, (update, record) in enumerate(updates)
+    ))
+    total = time.perf_counter() - started
+
+    await telegram_service.stop()
+    light_latencies.sort()
+    return {
+        "mode": mode,
+        "light_p50_ms": statistics.median(light_latencies) * 1000,
+        "light_max_ms": light_latencies[-1] * 1000,
+        "total_s": total,
+    }
+
+
+async def main(args):
+    for mode in ("inline", "offloaded"):
+        result = await run(mode, args.slow, args.light, args.calendar_latency, args.gap)
+        print(
+            f"{result['mode']:>9}: light update p50 {result['light_p50_ms']:.1f} ms, "
+            f"max {result['light_max_ms']:.1f} ms, total {result['total_s']:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slow", type=int, default=8, help="Concurrent updates that hit the Calendar API")
+    parser.add_argument("--light", type=int, default=20, help="Concurrent updates that don't")
+    parser.add_argument("--calendar-latency", type=float, default=0.5, help="Seconds per Calendar call")
+    parser.add_argument("--gap", type=float, default=0.05, help="Seconds between update arrivals")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+"""Resident memory of the conversation store across many simulated chats.
+
+Each simulated chat sends a handful of messages; RSS is sampled as the number
+of chats grows. With chat eviction in place RSS levels off once the store is
+full instead of growing with every new chat. Run from the ``backend``
+directory::
+
+    python -m benchmarks.bench_conversation_memory --chats 100000
+"""
+import argparse
+import gc
+import os
+import resource
+
+from app.services.conversation import ConversationState, InMemoryConversationStore
+
+
+def current_rss_mb() -> float:
+    """Current resident set size; falls back to peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(args):
+    store = InMemoryConversationStore(max_messages=args.max_messages, max_chats=args.max_chats)
+    state = ConversationState(store)
+    message = "Schedule a meeting with the design team tomorrow at 3pm " * 2
+    checkpoint = max(args.chats // 10, 1)
+
+    print(f"{'chats':>8} {'stored':>8} {'store MB':>9} {'RSS MB':>8}")
+    for chat_id in range(1, args.chats + 1):
+        for i in range(args.messages_per_chat):
+            state.add_message(chat_id, "user" if i % 2 == 0 else "assistant", f"{message}{i}")
+        if chat_id % checkpoint == 0:
+            gc.collect()
+            print(
+                f"{chat_id:>8} {len(store.conversations):>8} "
+                f"{store.memory_usage() / 2**20:>9.1f} {current_rss_mb():>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=100000)
+    parser.add_argument("--messages-per-chat", type=int, default=30)
+    parser.add_argument("--max-messages", type=int, default=20)
+    parser.add_argument("--max-chats", type=int, default=10000)
+    main(parser.parse_args())
@@ -0,0 +1,63 @@
+"""Calendar API traffic for repeated event queries, with and without the events cache.
+
+Runs the same mix of day/name queries against a stub calendar, with one
+event change between queries, and counts API requests and events transferred.
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_events_cache --events 2000 --queries 200
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from app.services import google_calendar
+from app.services.google_calendar import GoogleCalendarService
+from benchmarks.stubs import FakeCalendarApi, connect_chats, make_event
+
+CHAT_ID = 1
+TITLES = ["Standup", "Design review", "Lunch with Bob", "1:1 with Alice", "Planning"]
+
+
+def run(enabled: bool, n_events: int, n_queries: int, latency: float) -> dict:
+    google_calendar.EVENTS_CACHE_ENABLED = enabled
+    start = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    events = [
+        make_event(f"evt{i}", TITLES[i % len(TITLES)], (start + timedelta(days=i % 30, minutes=30 * (i // 30 % 20))).isoformat())
+        for i in range(n_events)
+    ]
+    api = FakeCalendarApi(latency=latency, events=events)
+    service = GoogleCalendarService()
+    connect_chats(service, api, [CHAT_ID])
+    if enabled:
+        service.get_events_cache(CHAT_ID, "primary").sync_interval = 0  # sync on every query
+
+    started = time.perf_counter()
+    for i in range(n_queries):
+        day = (start + timedelta(days=i % 7)).strftime("%Y-%m-%d")
+        service.query_events(CHAT_ID, {"date": day, "event_name": TITLES[i % len(TITLES)]})
+        # Someone edits an event between queries
+        api.update(calendarId="primary", eventId=f"evt{i}", body=dict(api.events_by_id[f"evt{i}"], summary="Moved")).execute()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": api.requests - n_queries,  # minus the edits
+        "events_transferred": api.listed_items,
+        "ms_per_query": elapsed / n_queries * 1000,
+    }
+
+
+def main(args):
+    for enabled in (False, True):
+        result = run(enabled, args.events, args.queries, args.latency)
+        print(
+            f"events cache {'on ' if enabled else 'off'}: {result['requests']} list requests, "
+            f"{result['events_transferred']} events transferred, {result['ms_per_query']:.1f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per Calendar API call")
+    main(parser.parse_args())
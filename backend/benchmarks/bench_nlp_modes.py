@@ -0,0 +1,60 @@
+"""Compare LLM round-trips and wall time per message for the NLPAgent modes.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_nlp_modes --messages 20 --latency 0.3
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.agent.nlp_agent import NLPAgent
+from app.services.conversation import Message
+from app.utils import llm
+from benchmarks.stubs import StubCompletion
+
+MESSAGES = [
+    "Schedule a meeting with Bob tomorrow at 3pm",
+    "What do I have on Friday?",
+    "Move my dentist appointment to 4pm",
+    "Cancel the design review",
+]
+
+
+async def run_mode(mode: str, n_messages: int, latency: float) -> dict:
+    stub = StubCompletion(latency=latency)
+    llm.load_litellm = lambda: SimpleNamespace(acompletion=stub)
+    agent = NLPAgent()
+    agent.mode = mode
+    history = []
+
+    started = time.perf_counter()
+    for i in range(n_messages):
+        message = MESSAGES[i % len(MESSAGES)]
+        history.append(Message("user", message))
+        await agent.analyze(message, history[-10:])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "llm_calls_per_message": stub.calls / n_messages,
+        "ms_per_message": elapsed / n_messages * 1000,
+    }
+
+
+async def main(n_messages: int, latency: float):
+    for mode in ("split", "combined"):
+        result = await run_mode(mode, n_messages, latency)
+        print(
+            f"{result['mode']:>8}: {result['llm_calls_per_message']:.2f} LLM calls/message, "
+            f"{result['ms_per_message']:.1f} ms/message"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Stubbed LLM latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.latency))
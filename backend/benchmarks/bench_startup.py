@@ -0,0 +1,96 @@
+"""Cold start: time to import the app and to answer the first webhook after startup.
+
+Each run is a fresh interpreter. ``lazy`` is the app as shipped, with heavy
+imports deferred. ``eager`` imports litellm, googleapiclient and
+google_auth_oauthlib up front, as the app did before. The first webhook is
+a "hi" from a chat with stored credentials. Answering it loads the chat's
+credentials and builds its Calendar client, but calls no LLM. Run from the
+``backend`` directory::
+
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(eager: bool):
+    started = time.perf_counter()
+    if eager:
+        import google_auth_oauthlib.flow  # noqa: F401
+        import googleapiclient.discovery  # noqa: F401
+        import litellm  # noqa: F401
+    import app.main as main
+    import_s = time.perf_counter() - started
+
+    import asyncio
+    import datetime
+    import httpx
+    from google.oauth2.credentials import Credentials
+    from app.api import routes
+    from app.services.telegram import TELEGRAM_API_BASE, telegram_service
+    from benchmarks.stubs import telegram_transport
+
+    routes.calendar_service.sync.store.save(1, Credentials(
+        token="token", refresh_token="refresh", client_id="id", client_secret="secret",
+        token_uri="https://oauth2.googleapis.com/token",
+        expiry=datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+    ))
+    sent = []
+    telegram_service.client = httpx.AsyncClient(base_url=TELEGRAM_API_BASE, transport=telegram_transport(sent=sent))
+    update = {"update_id": 1, "message": {"chat": {"id": 1}, "text": "hi"}}
+
+    async def first_webhook():
+        started = time.perf_counter()
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+                await client.post("/webhook", json=update)
+            while not any(call.get("chat_id") == 1 for call in sent):
+                await asyncio.sleep(0.001)
+            return time.perf_counter() - started
+
+    first_reply_s = asyncio.run(first_webhook())
+    print(json.dumps({"import_s": import_s, "first_reply_s": first_reply_s}))
+
+
+def run(mode: str) -> dict:
+    from cryptography.fernet import Fernet
+
+    env = dict(
+        os.environ,
+        CREDENTIALS_DIR=tempfile.mkdtemp(),
+        CREDENTIALS_KEY=Fernet.generate_key().decode(),
+        LITELLM_LOCAL_MODEL_COST_MAP="True",
+    )
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    for mode in ("eager", "lazy"):
+        results = [run(mode) for _ in range(args.runs)]
+        print(
+            f"{mode:>5}: import {statistics.median(r['import_s'] for r in results) * 1000:6.0f} ms, "
+            f"import + startup + first reply "
+            f"{statistics.median(r['import_s'] + r['first_reply_s'] for r in results) * 1000:6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=["eager", "lazy"])
+    parsed = parser.parse_args()
+    if parsed.child:
+        child(parsed.child == "eager")
+    else:
+        main(parsed)
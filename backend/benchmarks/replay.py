@@ -0,0 +1,203 @@
+"""Replay Telegram updates through the whole app in-process and report latency percentiles.
+
+Updates are POSTed to ``/webhook`` of the FastAPI app (started with its
+lifespan) at a steady rate, with the LLM, Google Calendar and the Telegram
+Bot API replaced by stubs with seeded log-normal latencies. An update's
+end-to-end latency runs from its POST until the dispatcher finishes
+processing it. Per-stage times come from the app's own ``calbot_stage_seconds``
+histogram, so they match what ``/metrics`` reports in production.
+
+The updates come from a JSONL file of recorded updates (one Telegram update
+object per line) or from a synthetic mix of greetings, fast-path queries and
+scheduling requests. Run from the ``backend`` directory::
+
+    python -m benchmarks.replay --updates 300 --chats 50 --rate 20
+    python -m benchmarks.replay --file recorded_updates.jsonl --rate 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from cryptography.fernet import Fernet
+
+# Settings are read at import time, so they go in before the app is imported
+os.environ.setdefault("CREDENTIALS_DIR", tempfile.mkdtemp())
+os.environ.setdefault("CREDENTIALS_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("WARM_UP_ON_START", "false")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+import httpx
+
+from app import main as app_main
+from app.api import routes
+from app.services.telegram import TELEGRAM_API_BASE, telegram_service
+from app.utils import llm
+from app.utils.metrics import stage_seconds
+from benchmarks.stubs import (
+    FakeCalendarApi,
+    LatencyModel,
+    StubCompletion,
+    connect_chats,
+    make_event,
+    telegram_transport,
+)
+
+# Synthetic traffic: (weight, text)
+MESSAGE_MIX = [
+    (3, "hi"),
+    (1, "thanks!"),
+    (3, "what do I have tomorrow?"),
+    (3, "Schedule a meeting with Bob tomorrow at 3pm"),
+]
+
+
+# A scheduling request typed as several quick messages
+BURST = ["meeting with Bob", "tomorrow", "at 3pm"]
+
+
+def synthetic_updates(n: int, chats: int, seed: int, bursts: float = 0.0) -> list:
+    """``n`` updates from the message mix; a ``bursts`` share of the chats' turns is sent as BURST instead."""
+    rng = random.Random(seed)
+    weights, texts = zip(*MESSAGE_MIX)
+    updates = []
+    while len(updates) < n:
+        chat_id = rng.randrange(chats) + 1
+        turn = BURST if rng.random() < bursts else [rng.choices(texts, weights)[0]]
+        for text in turn:
+            updates.append({"update_id": len(updates) + 1, "message": {"chat": {"id": chat_id}, "text": text}})
+    return updates[:n]
+
+
+def load_updates(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(int(len(sorted_values) * q), len(sorted_values) - 1)]
+
+
+async def replay(updates: list, rate: float, seed: int, llm_latency: float, calendar_latency: float,
+                 telegram_latency: float, sigma: float) -> dict:
+    completion = StubCompletion(latency=LatencyModel(llm_latency, sigma, seed))
+    llm.load_litellm = lambda: SimpleNamespace(acompletion=completion)
+
+    api = FakeCalendarApi(
+        latency=LatencyModel(calendar_latency, sigma, seed + 1),
+        events=[make_event("evt1", "Standup", "2030-01-01T09:00:00")],
+    )
+    chat_ids = {update["message"]["chat"]["id"] for update in updates if update.get("message")}
+    connect_chats(routes.calendar_service.sync, api, sorted(chat_ids))
+    telegram_calls = []
+    telegram_service.client = httpx.AsyncClient(
+        base_url=TELEGRAM_API_BASE,
+        transport=telegram_transport(LatencyModel(telegram_latency, sigma, seed + 2), telegram_calls),
+    )
+
+    posted, finished, chat_of = {}, {}, {}
+    process_update = routes.update_dispatcher.handler
+
+    async def timed_handler(update):
+        try:
+            return await process_update(update)
+        finally:
+            # A coalesced update stands for every earlier queued message of its chat
+            now = time.perf_counter()
+            chat = chat_of.get(update.update_id)
+            for update_id in posted:
+                if update_id <= update.update_id and chat_of[update_id] == chat and update_id not in finished:
+                    finished[update_id] = now
+
+    routes.update_dispatcher.handler = timed_handler
+    arrivals = random.Random(seed + 3)
+
+    async with app_main.lifespan(app_main.app):
+        stages_before = stage_seconds.snapshot()
+        llm_calls_before = completion.calls
+        telegram_calls.clear()
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            started = time.perf_counter()
+            next_at = started
+            for update in updates:
+                if rate:
+                    next_at += arrivals.expovariate(rate)
+                    await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+                chat_of[update["update_id"]] = (update.get("message") or {}).get("chat", {}).get("id")
+                posted[update["update_id"]] = time.perf_counter()
+                response = await client.post("/webhook", json=update)
+                if response.status_code != 200:
+                    posted.pop(update["update_id"])
+            while len(finished) < len(posted):
+                await asyncio.sleep(0.005)
+            elapsed = max(finished.values()) - started
+        stages_after = stage_seconds.snapshot()
+        telegram_count = len(telegram_calls)  # before shutdown adds deleteWebhook
+
+    routes.update_dispatcher.handler = process_update
+    latencies = sorted(finished[update_id] - posted[update_id] for update_id in posted)
+    stages = {}
+    for key, (count, total) in stages_after.items():
+        before_count, before_total = stages_before.get(key, (0, 0.0))
+        if count > before_count:
+            stages[dict(key)["stage"]] = (count - before_count, total - before_total)
+    return {
+        "updates": len(latencies),
+        "rejected": len(updates) - len(latencies),
+        "elapsed_s": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "coalesced": routes.update_dispatcher.coalesced,
+        "llm_calls": completion.calls - llm_calls_before,
+        "calendar_requests": api.requests,
+        "telegram_calls": telegram_count,
+        "stages": {stage: {"count": count, "mean_ms": total / count * 1000, "total_s": total}
+                   for stage, (count, total) in sorted(stages.items())},
+    }
+
+
+def print_report(result: dict):
+    print(f"{result['updates']} updates in {result['elapsed_s']:.2f} s "
+          f"({result['throughput']:.1f} updates/s, {result['rejected']} rejected)")
+    print(f"end-to-end: p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    print(f"calls: {result['coalesced']} updates coalesced, {result['llm_calls']} LLM, {result['calendar_requests']} Calendar, "
+          f"{result['telegram_calls']} Telegram")
+    print(f"{'stage':<22}{'count':>7}{'mean ms':>10}{'total s':>10}")
+    for stage, timing in result["stages"].items():
+        print(f"{stage:<22}{timing['count']:>7}{timing['mean_ms']:>10.1f}{timing['total_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="JSONL file of recorded Telegram updates")
+    parser.add_argument("--updates", type=int, default=300, help="Synthetic updates to generate")
+    parser.add_argument("--chats", type=int, default=50, help="Distinct chats in synthetic traffic")
+    parser.add_argument("--bursts", type=float, default=0.0,
+                        help="Share of synthetic turns typed as several quick messages")
+    parser.add_argument("--rate", type=float, default=20, help="Arrivals per second (0 sends everything at once)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Median stubbed LLM latency in seconds")
+    parser.add_argument("--calendar-latency", type=float, default=0.15)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--sigma", type=float, default=0.4, help="Log-normal spread of all stubbed latencies")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per stubbed request otherwise
+    updates = load_updates(args.file) if args.file else synthetic_updates(args.updates, args.chats, args.seed, args.bursts)
+    result = asyncio.run(replay(
+        updates, args.rate, args.seed, args.llm_latency, args.calendar_latency, args.telegram_latency, args.sigma
+    ))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
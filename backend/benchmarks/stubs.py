@@ -0,0 +1,294 @@
+"""Deterministic stand-ins for the external services used by the benchmarks."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+
+import httpx
+
+
+class LatencyModel:
+    """Log-normal latency around ``median`` seconds, reproducible for a given ``seed``.
+
+    ``sigma`` sets the tail: 0 is a constant latency, 0.5 puts p99 at about 3.2x the median.
+    """
+
+    def __init__(self, median: float, sigma: float = 0.0, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()  # sampled from the calendar worker threads too
+
+    def __call__(self) -> float:
+        if not self.sigma:
+            return self.median
+        with self._lock:
+            return self._random.lognormvariate(math.log(self.median), self.sigma)
+
+
+def delay(latency) -> float:
+    """Seconds to wait for a fixed ``latency`` or a LatencyModel."""
+    return latency() if callable(latency) else latency
+
+
+class StubCompletion:
+    """Replacement for ``litellm.acompletion`` that counts calls and sleeps a fixed latency or a LatencyModel."""
+
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self, model=None, messages=None, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._stream("Sure, I've taken care of that for you. Anything else?")
+        await asyncio.sleep(delay(self.latency))
+        system_prompt = messages[0]["content"] if messages else ""
+        if kwargs.get("response_format") or "JSON" in system_prompt:
+            content = json.dumps({
+                "relevant": True,
+                "reason": "Scheduling request",
+                "intent": "create",
+                "event_name": "Meeting with Bob",
+                "date": "2025-03-15",
+                "start_time": "15:00",
+                "end_time": "16:00",
+                "description": "",
+                "participants": [],
+                "location": None,
+                "confirmation_needed": False,
+            })
+        else:
+            content = "Sure, done!"
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+    async def _stream(self, content: str):
+        # First token arrives after a fifth of the latency, the rest is spread over the remainder
+        words = content.split(" ")
+        latency = delay(self.latency)
+        await asyncio.sleep(latency / 5)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(latency * 4 / 5 / len(words))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+
+class _FakeRequest:
+    def __init__(self, latency: float, result, error: Exception = None, api=None):
+        self.latency = latency
+        self.result = result
+        self.error = error
+        self.api = api
+
+    def execute(self, http=None):
+        if self.api is not None:
+            self.api.round_trips += 1
+        time.sleep(delay(self.latency))
+        if self.error is not None:
+            raise self.error
+        return self.result() if callable(self.result) else self.result
+
+
+class _FakeBatch:
+    """Stand-in for BatchHttpRequest: every added request completes in one round-trip."""
+
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self, http=None):
+        self.api.round_trips += 1
+        time.sleep(delay(self.api.latency))
+        for request_id, request in self.requests:
+            try:
+                response = request.result() if callable(request.result) else request.result
+                if request.error is not None:
+                    raise request.error
+            except Exception as e:
+                self.callback(request_id, None, e)
+            else:
+                self.callback(request_id, response, None)
+
+
+class FakeCalendarApi:
+    """In-memory stand-in for the googleapiclient Calendar v3 resource.
+
+    Every ``execute()`` blocks for ``latency`` seconds, like the real client,
+    then raises ``error`` if one is set. ``events().list`` supports paging and
+    ``syncToken`` incremental sync.
+    """
+
+    def __init__(self, latency: float = 0.2, events=None, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.events_by_id = {event["id"]: event for event in (events or [])}
+        self.requests = 0
+        self.round_trips = 0
+        self.listed_items = 0
+        self.version = 0
+        self.changes = []  # (version, event_id)
+
+    def _request(self, result):
+        self.requests += 1
+        return _FakeRequest(self.latency, result, self.error, self)
+
+    def _changed(self, event_id):
+        self.version += 1
+        self.changes.append((self.version, event_id))
+
+    def events(self):
+        return self
+
+    def settings(self):
+        return self
+
+    def calendarList(self):
+        return self
+
+    # settings().get / events().get
+    def get(self, setting=None, calendarId=None, eventId=None):
+        if setting:
+            return self._request({"value": "UTC"})
+        return self._request(lambda: dict(self.events_by_id[eventId]))
+
+    # events().list / calendarList().list
+    def list(self, calendarId=None, timeMin=None, timeMax=None, syncToken=None,
+             pageToken=None, maxResults=250, **kwargs):
+        if calendarId is None:
+            return self._request({"items": [{"id": "primary", "summary": "Primary"}]})
+
+        def result():
+            if syncToken is not None:
+                changed = sorted({event_id for version, event_id in self.changes if version > int(syncToken)})
+                items = [self.events_by_id.get(event_id, {"id": event_id, "status": "cancelled"}) for event_id in changed]
+            else:
+                items = sorted(
+                    (event for event in self.events_by_id.values()
+                     if (not timeMin or event["start"]["dateTime"] >= timeMin[:19])
+                     and (not timeMax or event["start"]["dateTime"] <= timeMax[:19])),
+                    key=lambda event: event["start"]["dateTime"],
+                )
+            offset = int(pageToken or 0)
+            response = {"items": items[offset:offset + maxResults]}
+            self.listed_items += len(response["items"])
+            if offset + maxResults < len(items):
+                response["nextPageToken"] = str(offset + maxResults)
+            else:
+                response["nextSyncToken"] = str(self.version)
+            return response
+        return self._request(result)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def patch(self, calendarId=None, eventId=None, body=None):
+        def result():
+            self.events_by_id[eventId] = dict(self.events_by_id[eventId], **body)
+            self._changed(eventId)
+            return self.events_by_id[eventId]
+        return self._request(result)
+
+    def insert(self, calendarId=None, body=None):
+        def result():
+            event = dict(body, id=f"evt{len(self.events_by_id) + 1}", htmlLink="https://calendar.example/evt")
+            self.events_by_id[event["id"]] = event
+            self._changed(event["id"])
+            return event
+        return self._request(result)
+
+    def update(self, calendarId=None, eventId=None, body=None):
+        def result():
+            self.events_by_id[eventId] = dict(body)
+            self._changed(eventId)
+            return self.events_by_id[eventId]
+        return self._request(result)
+
+    def delete(self, calendarId=None, eventId=None):
+        def result():
+            self.events_by_id.pop(eventId, None)
+            self._changed(eventId)
+            return ""
+        return self._request(result)
+
+
+class MultiCalendarApi:
+    """Several FakeCalendarApi calendars behind one resource, routed by ``calendarId``."""
+
+    def __init__(self, calendars: dict):
+        self.calendars = calendars
+
+    @property
+    def requests(self):
+        return sum(api.requests for api in self.calendars.values())
+
+    def events(self):
+        return self
+
+    def settings(self):
+        return next(iter(self.calendars.values()))
+
+    def calendarList(self):
+        return self
+
+    def get(self, calendarId=None, eventId=None):
+        return self.calendars[calendarId].get(calendarId=calendarId, eventId=eventId)
+
+    def list(self, calendarId=None, **kwargs):
+        if calendarId is None:  # calendarList().list: every calendar is visible and selected
+            items = [{"id": calendar_id, "summary": calendar_id, "selected": True} for calendar_id in self.calendars]
+            return next(iter(self.calendars.values()))._request({"items": items})
+        return self.calendars[calendarId].list(calendarId=calendarId, **kwargs)
+
+    def insert(self, calendarId=None, body=None):
+        return self.calendars[calendarId].insert(calendarId=calendarId, body=body)
+
+    def update(self, calendarId=None, eventId=None, body=None):
+        return self.calendars[calendarId].update(calendarId=calendarId, eventId=eventId, body=body)
+
+    def patch(self, calendarId=None, eventId=None, body=None):
+        return self.calendars[calendarId].patch(calendarId=calendarId, eventId=eventId, body=body)
+
+    def new_batch_http_request(self, callback=None):
+        return next(iter(self.calendars.values())).new_batch_http_request(callback)
+
+    def delete(self, calendarId=None, eventId=None):
+        return self.calendars[calendarId].delete(calendarId=calendarId, eventId=eventId)
+
+
+def connect_chats(calendar_service, api, chat_ids) -> None:
+    """Give each chat a session on ``api``, so the GoogleCalendarService treats it as signed in."""
+    calendar_service.max_clients = max(calendar_service.max_clients, len(chat_ids))
+    for chat_id in chat_ids:
+        calendar_service.open_session(chat_id, None, api)
+
+
+def make_event(event_id: str, summary: str, start: str, minutes: int = 30) -> dict:
+    start_dt = datetime.fromisoformat(start)
+    end_dt = start_dt + timedelta(minutes=minutes)
+    return {
+        "id": event_id,
+        "summary": summary,
+        "start": {"dateTime": start_dt.isoformat()},
+        "end": {"dateTime": end_dt.isoformat()},
+        "htmlLink": f"https://calendar.example/{event_id}",
+    }
+
+
+def telegram_transport(latency: float = 0.0, sent: list = None):
+    """httpx transport that answers every Bot API call with ``ok`` after ``latency`` seconds (or a LatencyModel)."""
+
+    async def handler(request):
+        await asyncio.sleep(delay(latency))
+        if sent is not None:
+            sent.append(json.loads(request.content or b"{}"))
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": 1}})
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,40 @@
+import sys
+import unittest
+
+from app.services.conversation import ConversationStore, InMemoryConversationStore, Message
+
+
+def walked_size(store: InMemoryConversationStore) -> int:
+    total = sys.getsizeof(store.conversations)
+    for chat in store.conversations.values():
+        total += sys.getsizeof(chat) + sys.getsizeof(chat.messages)
+        for message in chat.messages:
+            total += sys.getsizeof(message) + sys.getsizeof(message.content) + sys.getsizeof(message.timestamp)
+    return total
+
+
+class InMemoryConversationStoreTest(unittest.TestCase):
+    def test_running_totals_follow_appends_and_evictions(self):
+        store = InMemoryConversationStore(max_messages=3, max_chats=4, idle_ttl=3600)
+        for i in range(40):
+            store.append(i % 6, Message("user", "x" * i, "text", float(i)))
+        store.clear(3)
+
+        stats = store.stats()
+        self.assertEqual(stats["chats"], 3)
+        self.assertEqual(stats["messages"], sum(len(chat.messages) for chat in store.conversations.values()))
+        self.assertEqual(stats["memory_bytes"], walked_size(store))
+
+
+class ConversationStoreTest(unittest.TestCase):
+    def test_incomplete_backend_fails_when_created(self):
+        class AppendOnlyStore(ConversationStore):
+            def append(self, chat_id, message):
+                pass
+
+        with self.assertRaises(TypeError):
+            AppendOnlyStore()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from app.services.conversation import Message
+from app.services.conversation_sqlite import SQLiteConversationStore
+
+
+class SQLiteConversationStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteConversationStore(
+            path=os.path.join(directory.name, "conversations.db"),
+            max_messages=100,
+            batch_size=5,
+            flush_interval=0.001,
+        )
+        self.addCleanup(self.store.close)
+
+    def test_reads_during_writes_see_each_message_once(self):
+        seen = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                seen.append([int(message.content) for message in self.store.last(1, 100)])
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(500):
+            self.store.append(1, Message("user", str(i)))
+        self.store.flush()
+        done.set()
+        reader.join()
+
+        for contents in seen:
+            if contents:
+                self.assertEqual(contents, list(range(contents[0], contents[0] + len(contents))))
+        self.assertEqual([int(message.content) for message in self.store.last(1, 100)], list(range(400, 500)))
+
+    def test_stats_follow_writes(self):
+        for chat_id in (1, 2):
+            for i in range(3):
+                self.store.append(chat_id, Message("user", str(i)))
+        self.store.flush()
+
+        stats = self.store.stats()
+        self.assertEqual((stats["chats"], stats["messages"], stats["pending"]), (2, 6, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from app.agent.fast_path import FastPathRouter
+
+
+class QueryRuleTest(unittest.TestCase):
+    def setUp(self):
+        self.router = FastPathRouter(min_confidence=0.8, enabled=True)
+
+    def test_calendar_queries_take_the_fast_path(self):
+        for text in (
+            "what do I have tomorrow?",
+            "do I have meetings today",
+            "what's on my calendar today?",
+            "what's on tomorrow",
+            "what is on next monday?",
+            "show me my schedule for next week",
+            "any meetings on friday?",
+        ):
+            with self.subTest(text=text):
+                result = self.router.route(text)
+                self.assertIsNotNone(result)
+                self.assertEqual(result["intent"], "query")
+
+    def test_date_questions_are_not_calendar_queries(self):
+        for text in (
+            "what is today?",
+            "what's tomorrow",
+            "what is tomorrow?",
+            "what's next monday?",
+            "what today",
+            "show me tomorrow",
+        ):
+            with self.subTest(text=text):
+                self.assertIsNone(self.router.route(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
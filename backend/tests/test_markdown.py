@@ -0,0 +1,32 @@
+import unittest
+
+from app.services.telegram import escape_markdown, strip_markdown
+from app.utils.responses import render_created
+
+
+class MarkdownTest(unittest.TestCase):
+    def test_backslashes_are_escaped_first(self):
+        self.assertEqual(escape_markdown("C:\\data\\"), "C:\\\\data\\\\")
+        self.assertEqual(escape_markdown("a\\.b"), "a\\\\\\.b")
+
+    def test_escaping_round_trips(self):
+        for text in ("Backup C:\\data\\", "a_b *c* (x) [y] 1.5 - 2!", "back\\slash\\*"):
+            with self.subTest(text=text):
+                self.assertEqual(strip_markdown(escape_markdown(text)), text)
+
+    def test_plain_text_drops_markup(self):
+        event = {
+            "summary": "Backup C:\\data\\",
+            "start": "2030-01-02T09:00:00",
+            "end": "2030-01-02T10:00:00",
+            "htmlLink": "https://calendar.google.com/event?eid=a_b",
+        }
+        self.assertEqual(
+            strip_markdown(render_created(event)),
+            "Created Backup C:\\data\\ on Wed 2 Jan, 09:00-10:00. "
+            "Open in Google Calendar (https://calendar.google.com/event?eid=a_b)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
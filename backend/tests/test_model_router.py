@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services import ai_service
+from app.services.ai_service import ModelRouter
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def fake_acompletion(*outcomes):
+    """An ``acompletion`` whose n-th call sleeps, then returns or raises its n-th outcome."""
+    calls = []
+
+    async def acompletion(model=None, **kwargs):
+        delay, outcome = outcomes[len(calls)]
+        calls.append(model)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return acompletion, calls
+
+
+class ModelRouterTest(unittest.IsolatedAsyncioTestCase):
+    def router(self, **kwargs):
+        return ModelRouter(models={"large": "large-model", "fast": "fast-model"},
+                           **{"timeout": 0.1, "max_retries": 2, "backoff": 0.01, "hedge_after": 0, **kwargs})
+
+    async def test_timeouts_and_server_errors_are_retried(self):
+        acompletion, calls = fake_acompletion((1, "too late"), (0, ProviderError(503)), (0, "answer"))
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            self.assertEqual(await self.router().complete("reply", messages=[]), "answer")
+        self.assertEqual(calls, ["fast-model"] * 3)
+
+    async def test_client_errors_are_not_retried(self):
+        acompletion, calls = fake_acompletion((0, ProviderError(400)), (0, "answer"))
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            with self.assertRaises(ProviderError):
+                await self.router().complete("extraction", messages=[])
+        self.assertEqual(calls, ["large-model"])
+
+    async def test_gives_up_after_max_retries(self):
+        acompletion, calls = fake_acompletion(*[(0, ProviderError(429))] * 3)
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            with self.assertRaises(ProviderError):
+                await self.router().complete("reply", messages=[])
+        self.assertEqual(len(calls), 3)
+
+    async def test_hedged_request_wins_when_the_first_is_slow(self):
+        acompletion, calls = fake_acompletion((0.08, "first"), (0, "hedge"))
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            self.assertEqual(await self.router(hedge_after=0.02).complete("reply", messages=[]), "hedge")
+        self.assertEqual(len(calls), 2)
+
+    async def test_no_hedge_when_the_first_answers_in_time(self):
+        acompletion, calls = fake_acompletion((0, "first"), (0, "hedge"))
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            self.assertEqual(await self.router(hedge_after=0.02).complete("reply", messages=[]), "first")
+        self.assertEqual(len(calls), 1)
+
+    async def test_a_failed_first_request_falls_back_to_the_hedge(self):
+        acompletion, calls = fake_acompletion((0.04, ProviderError(500)), (0.02, "hedge"))
+        with mock.patch.object(ai_service, "acompletion", acompletion):
+            self.assertEqual(await self.router(hedge_after=0.02).complete("reply", messages=[]), "hedge")
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+from app.agent.fast_path import FastPathRouter
+from app.api.models import TelegramUpdate
+from app.services.update_queue import QueueFull, UpdateDispatcher, is_text
+
+fast_path = FastPathRouter(min_confidence=0.8, enabled=True)
+
+
+def needs_llm(update: TelegramUpdate) -> bool:
+    return is_text(update) and not fast_path.answers(update.message["text"])
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> TelegramUpdate:
+    return TelegramUpdate(update_id=update_id, message={"chat": {"id": chat_id}, "text": text})
+
+
+class UpdateDispatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.handled = []
+
+    async def start(self, handler=None, **kwargs):
+        async def record(update):
+            self.handled.append((update.message["chat"]["id"], update.message["text"]))
+
+        dispatcher = UpdateDispatcher(handler or record, **{"workers": 4, "enqueue_timeout": 0.05, **kwargs})
+        await dispatcher.start()
+        self.addAsyncCleanup(dispatcher.stop, 1.0)
+        return dispatcher
+
+    async def test_updates_of_a_chat_are_handled_in_order(self):
+        async def slow_first(update):
+            # The first message of each chat takes longest; its successors must still wait for it
+            await asyncio.sleep(0.05 if update.message["text"].endswith("0") else 0)
+            self.handled.append((update.message["chat"]["id"], update.message["text"]))
+
+        dispatcher = await self.start(slow_first, mergeable=lambda update: False)
+        for i in range(5):
+            for chat_id in (1, 2):
+                await dispatcher.submit(make_update(10 * chat_id + i, chat_id, f"message {i}"))
+        await dispatcher.stop()
+
+        for chat_id in (1, 2):
+            texts = [text for chat, text in self.handled if chat == chat_id]
+            self.assertEqual(texts, [f"message {i}" for i in range(5)])
+
+    async def test_redelivered_updates_are_dropped(self):
+        dispatcher = await self.start(mergeable=lambda update: False)
+        self.assertTrue(await dispatcher.submit(make_update(1, 1, "hi")))
+        self.assertFalse(await dispatcher.submit(make_update(1, 1, "hi")))
+        await dispatcher.stop()
+
+        self.assertEqual(self.handled, [(1, "hi")])
+        self.assertEqual(dispatcher.stats()["duplicates"], 1)
+
+    async def test_full_queue_rejects_updates(self):
+        release = asyncio.Event()
+
+        async def blocked(update):
+            await release.wait()
+
+        dispatcher = await self.start(blocked, workers=1, queue_size=2, mergeable=lambda update: False)
+        await dispatcher.submit(make_update(1, 1, "one"))
+        await asyncio.sleep(0.01)  # the only worker picks it up and blocks
+        await dispatcher.submit(make_update(2, 2, "two"))
+        await dispatcher.submit(make_update(3, 3, "three"))
+        with self.assertRaises(QueueFull):
+            await dispatcher.submit(make_update(4, 4, "four"))
+        self.assertEqual(dispatcher.stats()["rejected"], 1)
+        release.set()
+
+    async def test_texts_that_need_the_llm_are_merged(self):
+        dispatcher = await self.start(coalesce_window=0.05, mergeable=needs_llm)
+        for update_id, text in enumerate(["meeting with Bob", "on friday", "at 3pm"]):
+            await dispatcher.submit(make_update(update_id, 1, text))
+        await dispatcher.stop()
+
+        self.assertEqual(self.handled, [(1, "meeting with Bob\non friday\nat 3pm")])
+        self.assertEqual(dispatcher.stats()["coalesced"], 2)
+
+    async def test_fast_path_texts_are_not_merged(self):
+        dispatcher = await self.start(coalesce_window=0.05, mergeable=needs_llm)
+        for update_id, text in enumerate(["what do I have tomorrow?", "what's on my calendar today?"]):
+            await dispatcher.submit(make_update(update_id, 1, text))
+        await dispatcher.stop()
+
+        self.assertEqual(self.handled, [(1, "what do I have tomorrow?"), (1, "what's on my calendar today?")])
+        self.assertEqual(dispatcher.stats()["coalesced"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()